@@ -0,0 +1,86 @@
+"""Measure cold start of deepresearch.main:app in fresh interpreters.
+
+Usage: python -m benchmarks.bench_cold_start [--runs N]
+
+Each run starts a new Python process and reports:
+- import: time to import deepresearch.main
+- startup: time for the app lifespan to start
+- first request: time for the first POST /api/v1/query, which builds the
+  clients it needs
+- clients: how many AsyncOpenAI and httpx.AsyncClient objects exist by then
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PROBE = r"""
+import asyncio, gc, json, time
+t0 = time.perf_counter()
+import deepresearch.main as main
+t1 = time.perf_counter()
+import httpx, openai
+
+def live(cls):
+    return sum(1 for obj in gc.get_objects() if isinstance(obj, cls))
+
+imported = {"openai": live(openai.AsyncOpenAI), "httpx": live(httpx.AsyncClient)}
+t2 = time.perf_counter()
+
+async def run():
+    async with main.app.router.lifespan_context(main.app):
+        t3 = time.perf_counter()
+        async def no_research(*args, **kwargs):
+            return None
+        main.Agent.process_query = no_research
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.post("/api/v1/query", json={"q": "cold start"})
+            response.raise_for_status()
+        t4 = time.perf_counter()
+        # Counted before shutdown closes them; the bench client itself is excluded.
+        after = {"openai": live(openai.AsyncOpenAI), "httpx": live(httpx.AsyncClient) - 1}
+    return t3, t4, after
+
+t3, t4, after = asyncio.run(run())
+print(json.dumps({
+    "import": t1 - t0,
+    "startup": t3 - t2,
+    "first_request": t4 - t3,
+    "clients_at_import": imported,
+    "clients_after_request": after,
+}))
+"""
+
+
+def run_once(env: Dict[str, str]) -> Dict:
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+    env.setdefault("OPENAI_API_KEY", "bench")
+    env.setdefault("JINA_API_KEY", "bench")
+    runs = [run_once(env) for _ in range(args.runs)]
+
+    for field in ("import", "startup", "first_request"):
+        values = [run[field] * 1e3 for run in runs]
+        print(f"{field:<15} median {statistics.median(values):8.1f}ms   min {min(values):8.1f}ms")
+    print(f"clients at import:     {runs[-1]['clients_at_import']}")
+    print(f"clients after request: {runs[-1]['clients_after_request']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Compare the stock and fast decode paths for large Jina/Brave payloads.
+
+Usage: python -m benchmarks.bench_decode [--rounds N]
+
+"before" is what the tools did originally (httpx response.json() followed by full
+pydantic validation); "after" is deepresearch.utils.fast_json.decode. CPU time is
+process time per decode; peak allocation is measured with tracemalloc.
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("JINA_API_KEY", "bench")
+
+from deepresearch.types import BraveSearchResponse, ReadResponse, SearchResponse  # noqa: E402
+from deepresearch.utils import fast_json  # noqa: E402
+
+
+def _markdown(size: int) -> str:
+    paragraph = ("## Section\n\nLorem ipsum dolor sit amet, **consectetur** adipiscing elit. "
+                 "See [the docs](https://example.com/docs) for details.\n\n")
+    return (paragraph * (size // len(paragraph) + 1))[:size]
+
+
+def payloads() -> Dict[str, Tuple[type, bytes]]:
+    result = lambda i, size: {
+        "title": f"Result {i}", "description": "A search result", "url": f"https://example.com/{i}",
+        "content": _markdown(size), "usage": {"tokens": size // 4}
+    }
+    search = {"code": 200, "status": 20000, "data": [result(i, 300_000) for i in range(10)]}
+    read = {"code": 200, "status": 20000, "data": result(0, 1_000_000)}
+    brave = {"web": {"results": [
+        {"title": f"Result {i}", "description": "x" * 400, "url": f"https://example.com/{i}", "age": "1d"}
+        for i in range(20)
+    ]}, "query": {"original": "bench"}}
+    return {
+        "jina-search": (SearchResponse, json.dumps(search).encode()),
+        "read": (ReadResponse, json.dumps(read).encode()),
+        "brave-search": (BraveSearchResponse, json.dumps(brave).encode()),
+    }
+
+
+def before(model: type, raw: bytes) -> Any:
+    return model(**json.loads(raw.decode()))
+
+
+def after(model: type, raw: bytes) -> Any:
+    return fast_json.decode(model, raw)
+
+
+def measure(fn: Callable[[type, bytes], Any], model: type, raw: bytes, rounds: int) -> Tuple[float, int]:
+    fn(model, raw)  # warm up
+    start = time.process_time()
+    for _ in range(rounds):
+        fn(model, raw)
+    cpu = (time.process_time() - start) / rounds
+
+    tracemalloc.start()
+    fn(model, raw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu, peak
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    print(f"json backend: {'orjson' if fast_json.orjson else 'stdlib'}")
+    print(f"{'payload':<14}{'size':>10}{'cpu before':>14}{'cpu after':>12}{'peak before':>14}{'peak after':>13}")
+    for name, (model, raw) in payloads().items():
+        cpu_before, peak_before = measure(before, model, raw, args.rounds)
+        cpu_after, peak_after = measure(after, model, raw, args.rounds)
+        print(f"{name:<14}{len(raw) / 1e6:>8.2f}MB"
+              f"{cpu_before * 1e3:>12.2f}ms{cpu_after * 1e3:>10.2f}ms"
+              f"{peak_before / 1e6:>12.2f}MB{peak_after / 1e6:>11.2f}MB")
+
+
+if __name__ == "__main__":
+    main()
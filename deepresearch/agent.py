@@ -1,31 +1,42 @@
 import asyncio
 import uuid
-from typing import Dict, AsyncGenerator, Any, Optional, Union
+from typing import Dict, AsyncGenerator, Any, List, Optional, Tuple, Union
 
-from openai import AsyncOpenAI
-from openai.types.chat import ChatCompletion
 
 from .config import settings, modelConfigs
-from .types import QueryRequest, QueryResponse, BaseAction
+from .types import QueryRequest, QueryResponse, BaseAction, AnswerAction, ActionType, EvaluationResponse, Reference
 from .utils.token_tracker import TokenTracker
 from .utils.action_tracker import ActionTracker
 from .tools.jina_search import JinaSearch
 from .tools.brave_search import BraveSearch
+from .tools.search_router import SearchRouter
 from .tools.read import Reader
 from .tools.evaluator import Evaluator
 from .tools.error_analyzer import ErrorAnalyzer
 from .tools.query_rewriter import QueryRewriter
 from .tools.dedup import Deduplicator
+from .utils.metrics import TASKS_IN_FLIGHT, instrument_tool, track_upstream
+from .utils.tracer import tracer
+from .utils.state_backend import state_backend, tracker_snapshot
+from .utils.speculator import Speculator
+from .utils.timeouts import stage_timeout
+from .utils.answer_cache import answer_cache
+from .utils.budget_planner import BudgetPlanner
+from .utils.llm_clients import get_llm_client
 
 class Agent:
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
         self.token_tracker = TokenTracker()
         self.action_tracker = ActionTracker()
+        self.planner = BudgetPlanner(self.token_tracker)
         self.tasks: Dict[str, QueryResponse] = {}
+        self.state = state_backend
         
         # Initialize search function
-        self.search = JinaSearch.search if settings.SEARCH_PROVIDER == "jina" else BraveSearch.search
+        if settings.SEARCH_PROVIDER == "router":
+            self.search = SearchRouter.search
+        else:
+            self.search = JinaSearch.search if settings.SEARCH_PROVIDER == "jina" else BraveSearch.search
 
     async def start_query(self, request: QueryRequest) -> str:
         request_id = str(uuid.uuid4())
@@ -37,26 +48,65 @@ class Agent:
         asyncio.create_task(self._process_query(request_id, request))
         return request_id
 
-    async def stream_events(self, request_id: str) -> AsyncGenerator[Dict[str, Any], None]:
-        if request_id not in self.tasks:
-            self.tasks[request_id] = QueryResponse(
-                request_id=request_id,
-                status="running",
-                actions=[]
+    async def publish(self, request_id: str, action: BaseAction) -> None:
+        if request_id in self.tasks:
+            self.tasks[request_id].actions.append(action)
+        await self.state.append_event(request_id, {"data": action.model_dump(mode="json")})
+        await self.state.save_snapshot(request_id, tracker_snapshot(self.token_tracker, self.action_tracker, self.planner))
+
+    async def evaluate_answer(
+        self,
+        question: str,
+        answer: AnswerAction
+    ) -> Tuple[EvaluationResponse, Optional[Speculator]]:
+        # With SPECULATIVE_EXECUTION on, follow-up searches and reads for open gaps
+        # run while the evaluator decides. An accepted answer cancels them; a
+        # rejected one hands back the still-running Speculator so the caller can
+        # run ErrorAnalyzer and then commit() the results.
+        # The planner vetoes speculation in beast mode and caps it like any other step.
+        speculator = None
+        gaps = self.action_tracker.get_state()["gaps"]
+        if settings.SPECULATIVE_EXECUTION and gaps and self.planner.allows(ActionType.SEARCH.value):
+            cap = self.planner.step_cap(ActionType.SEARCH.value)
+            speculator = Speculator(
+                self.search,
+                self.token_tracker,
+                min(settings.SPECULATIVE_BUDGET, cap) if cap is not None else settings.SPECULATIVE_BUDGET,
+                max_gaps=settings.SPECULATIVE_MAX_GAPS,
+                max_reads=settings.SPECULATIVE_MAX_READS
             )
-            
-        task = self.tasks[request_id]
-        last_action_count = 0
-        
-        while task.status == "running":
-            if len(task.actions) > last_action_count:
-                for action in task.actions[last_action_count:]:
-                    yield {"data": action.model_dump()}
-                last_action_count = len(task.actions)
+            if not speculator.start(gaps):
+                speculator = None
+
+        try:
+            with self.planner.step("evaluate"):
+                evaluation, _ = await Evaluator.evaluate_answer(question, answer.answer, self.token_tracker)
+        except BaseException:
+            if speculator:
+                await speculator.cancel()
+            raise
+
+        if speculator and evaluation.is_definitive:
+            await speculator.cancel()
+            speculator = None
+        return evaluation, speculator
+
+    async def stream_events(self, request_id: str) -> AsyncGenerator[Dict[str, Any], None]:
+        # Reads from the shared state backend, so any worker can serve the stream.
+        cursor = 0
+        while True:
+            # Read the status first so events written before completion are not missed.
+            status = await self.state.get_status(request_id)
+            for cursor, event in await self.state.get_events(request_id, cursor):
+                yield event
+            if status is None or status["status"] not in ("running", "cancelling"):
+                break
             await asyncio.sleep(settings.STEP_SLEEP / 1000)
 
-        if task.final_answer:
-            yield {"data": {"type": "final", "answer": task.final_answer}}
+        if status and status["status"] == "cancelled":
+            yield {"data": {"type": "cancelled"}}
+        elif status and status["final_answer"]:
+            yield {"data": {"type": "final", "answer": status["final_answer"]}}
 
     async def get_task(self, request_id: str) -> QueryResponse:
         if request_id not in self.tasks:
@@ -70,12 +120,15 @@ class Agent:
         budget: int | None = None,
         max_bad_attempt: int | None = None,
         token_tracker: TokenTracker | None = None,
-        action_tracker: ActionTracker | None = None
+        action_tracker: ActionTracker | None = None,
+        planner: BudgetPlanner | None = None,
+        no_cache: bool = False
     ) -> None:
         if token_tracker:
             self.token_tracker = token_tracker
         if action_tracker:
             self.action_tracker = action_tracker
+        self.planner = planner or BudgetPlanner(self.token_tracker)
 
         self.tasks[request_id] = QueryResponse(
             request_id=request_id,
@@ -83,16 +136,51 @@ class Agent:
             actions=[]
         )
         task = self.tasks[request_id]
+        TASKS_IN_FLIGHT.inc()
+        tracer.start_trace(request_id)
         try:
                 
             # Process query using tools
-            result = await self._process_query(request_id, QueryRequest(query=query))
+            with tracer.span("task", query=query, budget=budget or 0):
+                cached = answer_cache.get(query) if settings.ANSWER_CACHE and not no_cache else None
+                if cached:
+                    await self.publish(request_id, AnswerAction(
+                        action=ActionType.ANSWER,
+                        think="Answered from the answer cache",
+                        answer=cached.answer,
+                        references=cached.references
+                    ))
+                    result = cached.answer
+                else:
+                    result = await self._process_query(request_id, QueryRequest(query=query))
+                    if settings.ANSWER_CACHE:
+                        answer_cache.put(query, result, self._answer_references(result))
             task.final_answer = result
             task.status = "completed"
+        except asyncio.CancelledError:
+            task.status = "cancelled"
+            raise
         except Exception as e:
             task.status = "error"
             task.final_answer = str(e)
+        finally:
+            TASKS_IN_FLIGHT.dec()
+            # Anything still reserved (e.g. by speculation cut short) is no longer needed.
+            self.token_tracker.release(self.token_tracker.reserved)
+            # Shielded so a cancelled task still records why it stopped.
+            await asyncio.shield(self._finish(request_id, task))
+
+    def _answer_references(self, answer: str) -> List[Reference]:
+        this_step = self.action_tracker.get_state()["this_step"]
+        if isinstance(this_step, AnswerAction) and this_step.answer == answer:
+            return this_step.references
+        return []
+
+    async def _finish(self, request_id: str, task: QueryResponse) -> None:
+        await self.state.save_snapshot(request_id, tracker_snapshot(self.token_tracker, self.action_tracker, self.planner))
+        await self.state.set_status(request_id, task.status, task.final_answer)
             
+    @instrument_tool("agent")
     async def _process_query(self, request_id: str, request: QueryRequest) -> str:
         if request_id not in self.tasks:
             self.tasks[request_id] = QueryResponse(
@@ -103,11 +191,15 @@ class Agent:
         task = self.tasks[request_id]
         try:
             # Initial query processing
-            response = await self.client.chat.completions.create(
-                model=modelConfigs["evaluator"]["model"],
-                messages=[{"role": "user", "content": request.query}],
-                temperature=modelConfigs["evaluator"]["temperature"]
-            )
+            with self.planner.step(ActionType.ANSWER.value), track_upstream("openai"):
+                async with stage_timeout("llm"):
+                    response = await get_llm_client(modelConfigs["evaluator"]["model"]).chat.completions.create(
+                        model=modelConfigs["evaluator"]["model"],
+                        messages=[{"role": "user", "content": request.query}],
+                        temperature=modelConfigs["evaluator"]["temperature"]
+                    )
+                if response.usage:
+                    await self.token_tracker.track_usage("agent", response)
             return response.choices[0].message.content
         except Exception as e:
             task.status = "error"
@@ -1,10 +1,63 @@
+from typing import Dict
+
 from pydantic_settings import BaseSettings
 
+from .utils.lazy import lazy
+
 class Settings(BaseSettings):
     OPENAI_API_KEY: str
+    OPENAI_BASE_URL: str = ""
     JINA_API_KEY: str
+    BRAVE_API_KEY: str = ""
     SEARCH_PROVIDER: str = "jina"
+    SEARCH_ROUTER_MODE: str = "auto"
+    SEARCH_HEDGE_DELAY: float = 1.0
+    SEARCH_FAILURE_THRESHOLD: int = 3
+    SEARCH_COOLDOWN: float = 60.0
     STEP_SLEEP: int = 100
+    DEFAULT_TOKEN_BUDGET: int = 1_000_000
+    PLANNER_MAX_STEP_FRACTION: float = 0.15
+    PLANNER_BEAST_MODE_STEPS: float = 2.0
+    PLANNER_ANSWER_MARGIN: float = 1.5
+    TRACE_MAX_TASKS: int = 256
+    TRACE_MAX_SPANS: int = 2000
+    LOOP_LAG_INTERVAL: float = 0.5
+    LOOP_BLOCK_DEBUG: bool = False
+    LOOP_BLOCK_THRESHOLD_MS: int = 100
+    CONTENT_POOL_MODE: str = "process"
+    CONTENT_POOL_WORKERS: int = 0
+    CONTENT_POOL_MAX_PENDING: int = 0
+    CONTENT_CHUNK_SIZE: int = 1500
+    STATE_BACKEND: str = "memory"
+    STATE_DB_PATH: str = "tasks/state.db"
+    STATE_TASK_TTL: int = 3600
+    STATE_TASK_LEASE: float = 30.0
+    SPECULATIVE_EXECUTION: bool = False
+    SPECULATIVE_BUDGET: int = 20000
+    SPECULATIVE_MAX_GAPS: int = 2
+    SPECULATIVE_MAX_READS: int = 2
+    SEARCH_TIMEOUT: float = 30.0
+    READ_TIMEOUT: float = 60.0
+    READ_STREAM: bool = True
+    READ_MAX_BYTES: int = 1_048_576
+    READ_MAX_TOKENS: int = 0
+    LLM_TIMEOUT: float = 120.0
+    CANCEL_ON_LAST_SUBSCRIBER: bool = False
+    CANCEL_GRACE_PERIOD: float = 10.0
+    CANCEL_POLL_INTERVAL: float = 1.0
+    DIARY_RECENT_STEPS: int = 4
+    DIARY_DIGEST_TOKENS: int = 800
+    ERROR_ANALYZER_MAX_TOKENS: int = 4000
+    FAST_DECODE: bool = True
+    CASSETTE_MODE: str = "off"
+    CASSETTE_PATH: str = "cassettes/session.jsonl.gz"
+    CASSETTE_LATENCY_SCALE: float = 1.0
+    ANSWER_CACHE: bool = True
+    ANSWER_CACHE_TTL: float = 86400.0
+    ANSWER_CACHE_FRESH_TTL: float = 1800.0
+    ANSWER_CACHE_SIZE: int = 1000
+    ANSWER_CACHE_MAX_DISTANCE: int = 16
+    ANSWER_CACHE_MIN_SIMILARITY: float = 0.8
 
     class Config:
         env_file = ".env"
@@ -12,23 +65,48 @@ class Settings(BaseSettings):
 modelConfigs = {
     "evaluator": {
         "model": "gpt-4o",
-        "temperature": 0.1
+        "temperature": 0.1,
+        "cascade": ["gpt-4o-mini", "gpt-4o"],
+        "minConfidence": 0.7
     },
     "errorAnalyzer": {
         "model": "gpt-4o",
         "temperature": 0.1
     },
+    "diaryCompactor": {
+        "model": "gpt-4o-mini",
+        "temperature": 0.1
+    },
     "queryRewriter": {
         "model": "gpt-4o",
-        "temperature": 0.7
+        "temperature": 0.7,
+        "cascade": ["gpt-4o-mini", "gpt-4o"]
     },
     "dedup": {
         "model": "gpt-4o",
-        "temperature": 0.1
+        "temperature": 0.1,
+        "cascade": ["gpt-4o-mini", "gpt-4o"],
+        "minConfidence": 0.7
     }
 }
 
-try:
-    settings = Settings(_env_file=".env")
-except Exception as e:
-    settings = Settings()
+# OpenAI-compatible endpoints for models not served from OPENAI_BASE_URL, e.g.
+# {"deepseek-ai/DeepSeek-V3": "https://api.example.com/v1"}. Each endpoint gets
+# one shared client.
+modelEndpoints: Dict[str, str] = {}
+
+# USD per 1M tokens, used to estimate per-tool spend in the model cascade.
+modelPrices = {
+    "gpt-4o": {"input": 2.5, "output": 10.0},
+    "gpt-4o-mini": {"input": 0.15, "output": 0.6}
+}
+
+def load_settings() -> Settings:
+    try:
+        return Settings(_env_file=".env")
+    except Exception:
+        return Settings()
+
+# Built on first use, so importing the package neither reads the environment nor
+# fails when API keys are missing.
+settings = lazy(load_settings)
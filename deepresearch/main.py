@@ -1,20 +1,73 @@
 import asyncio
 import json
-from datetime import datetime
+import time
+import uuid
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Dict, Optional, AsyncGenerator, Any
+from typing import Dict, Optional, AsyncGenerator, Any, Awaitable, Callable, Set
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from sse_starlette.sse import EventSourceResponse
 from pydantic import BaseModel
 
 from .agent import Agent
+from .config import settings
 from .types import QueryRequest, StreamMessage, StepAction
 from .utils.token_tracker import TokenTracker
+from .utils.budget_planner import BudgetPlanner
 from .utils.action_tracker import ActionTracker
+from .utils.metrics import SSE_SUBSCRIBERS, render_metrics
+from .utils.tracer import tracer
+from .utils.loop_monitor import LoopMonitor
+from .tools.content_processor import pool as content_pool
+from .utils.state_backend import state_backend, tracker_snapshot
+from .utils.lazy import is_built
+from .utils.stream_protocol import (
+    PROTOCOL_DELTA, CompressedEventSourceResponse, DeltaEncoder, negotiate_encoding
+)
+from .utils import fast_json
+from .utils.http_client import close_http_client
+from .utils.llm_clients import reset_llm_clients
+
+async def watch_running_tasks() -> None:
+    # A DELETE handled by another worker only marks the task "cancelling" in the
+    # shared backend; the worker running it picks that up here. The same loop
+    # renews this worker's lease on its tasks, a few times per lease period.
+    last_heartbeat = 0.0
+    while True:
+        await asyncio.sleep(settings.CANCEL_POLL_INTERVAL)
+        if running and time.monotonic() - last_heartbeat >= settings.STATE_TASK_LEASE / 3:
+            await state_backend.heartbeat(list(running))
+            last_heartbeat = time.monotonic()
+        for request_id, task in list(running.items()):
+            status = await state_backend.get_status(request_id)
+            if status and status["status"] == "cancelling":
+                task.cancel()
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop_monitor = LoopMonitor(
+        interval=settings.LOOP_LAG_INTERVAL,
+        debug=settings.LOOP_BLOCK_DEBUG,
+        block_threshold=settings.LOOP_BLOCK_THRESHOLD_MS / 1000
+    )
+    loop_monitor.start()
+    watcher = None
+    if settings.STATE_BACKEND != "memory":
+        watcher = asyncio.create_task(watch_running_tasks())
+    yield
+    if watcher:
+        watcher.cancel()
+    await loop_monitor.stop()
+    if is_built(content_pool):
+        content_pool.shutdown()
+    reset_llm_clients()
+    await close_http_client()
+    if is_built(state_backend):
+        await state_backend.close()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -27,16 +80,51 @@ class QueryBody(BaseModel):
     q: str
     budget: Optional[int] = None
     maxBadAttempt: Optional[int] = None
+    noCache: bool = False
 
-# Store trackers for each request
+# Trackers for requests running in this worker; other workers read snapshots from state_backend
 trackers: Dict[str, Dict[str, Any]] = {}
+# Handles of the tasks running in this worker, so they can be cancelled
+running: Dict[str, asyncio.Task] = {}
+# Keeps fire-and-forget bookkeeping tasks alive until they finish
+background: Set[asyncio.Task] = set()
+
+def budget_info(used: int, budget: Optional[int] = None, plan: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    total = budget or settings.DEFAULT_TOKEN_BUDGET
+    info: Dict[str, Any] = {
+        "used": used,
+        "total": total,
+        "percentage": f"{(used / total) * 100:.2f}"
+    }
+    if plan:
+        info["forecastSteps"] = plan["forecastSteps"]
+        info["beastMode"] = plan["beastMode"]
+    return info
+
+def progress_state(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """从追踪器快照构建进度状态（stream 协议 v2 的增量基准）。
+    
+    Args:
+        snapshot (Dict[str, Any]): tracker_snapshot 或状态后端保存的快照
+    
+    Returns:
+        Dict[str, Any]: 包含当前步骤、总步骤数、缺口、失败次数与预算使用情况
+    """
+    action_state = snapshot.get("actionState") or {}
+    return {
+        "step": action_state.get("total_step", 0),
+        "thisStep": action_state.get("this_step"),
+        "gaps": action_state.get("gaps", []),
+        "badAttempts": action_state.get("bad_attempts", 0),
+        "budget": budget_info(snapshot.get("tokenUsage", 0), snapshot.get("budget"), snapshot.get("plan"))
+    }
 
 def create_progress_message(request_id: str, budget: Optional[int] = None) -> StreamMessage:
     """创建进度消息。
     
     Args:
         request_id (str): 请求 ID
-        budget (Optional[int]): token 预算限制，默认为 None
+        budget (Optional[int]): token 预算限制，默认为 settings.DEFAULT_TOKEN_BUDGET
     
     Returns:
         StreamMessage: 包含进度信息的消息对象，包括：
@@ -49,19 +137,49 @@ def create_progress_message(request_id: str, budget: Optional[int] = None) -> St
     action_tracker = context["action_tracker"]
     
     state = action_tracker.get_state()
-    budget_info = {
-        "used": token_tracker.get_total_usage(),
-        "total": budget or 1_000_000,
-        "percentage": f"{(token_tracker.get_total_usage() / (budget or 1_000_000)) * 100:.2f}"
-    }
     
     return StreamMessage(
         type="progress",
         data=state["this_step"],
         step=state["total_step"],
-        budget=budget_info
+        budget=budget_info(token_tracker.get_total_usage(), budget)
     )
 
+async def cancel_task(request_id: str) -> bool:
+    """请求取消任务。
+    
+    Args:
+        request_id (str): 请求 ID
+    
+    Returns:
+        bool: 任务正在运行并已标记为 cancelling 时返回 True
+    
+    Note:
+        - 本 worker 运行的任务立即取消，取消会传递到进行中的 httpx/OpenAI 请求
+        - 其他 worker 运行的任务由其 watch_running_tasks 轮询后取消
+    """
+    if not await state_backend.request_cancel(request_id):
+        return False
+    task = running.get(request_id)
+    if task:
+        task.cancel()
+    return True
+
+async def cancel_if_abandoned(request_id: str) -> None:
+    # Give reconnecting clients a grace period before the work is thrown away.
+    await asyncio.sleep(settings.CANCEL_GRACE_PERIOD)
+    if await state_backend.update_subscribers(request_id, 0) == 0:
+        await cancel_task(request_id)
+
+def spawn(coro: Any) -> None:
+    task = asyncio.get_running_loop().create_task(coro)
+    background.add(task)
+    task.add_done_callback(background.discard)
+
+async def unsubscribe(request_id: str) -> None:
+    if await state_backend.update_subscribers(request_id, -1) == 0 and settings.CANCEL_ON_LAST_SUBSCRIBER:
+        await cancel_if_abandoned(request_id)
+
 async def store_task_result(request_id: str, result: StepAction) -> None:
     """存储任务结果到文件系统。
     
@@ -73,12 +191,16 @@ async def store_task_result(request_id: str, result: StepAction) -> None:
         - 在当前工作目录下创建 tasks 目录
         - 以 JSON 格式保存结果
         - 文件名为 {request_id}.json
+        - 序列化与文件写入在线程中执行，避免阻塞事件循环
     """
-    task_dir = Path.cwd() / "tasks"
-    task_dir.mkdir(exist_ok=True)
+    def write() -> None:
+        task_dir = Path.cwd() / "tasks"
+        task_dir.mkdir(exist_ok=True)
+        
+        task_path = task_dir / f"{request_id}.json"
+        task_path.write_text(json.dumps(result.model_dump(), indent=2))
     
-    task_path = task_dir / f"{request_id}.json"
-    task_path.write_text(json.dumps(result.model_dump(), indent=2))
+    await asyncio.to_thread(write)
 
 @app.post("/api/v1/query")
 async def query(request: QueryBody) -> Dict[str, str]:
@@ -87,51 +209,68 @@ async def query(request: QueryBody) -> Dict[str, str]:
     Args:
         request (QueryBody): 查询请求体，包含：
             - q (str): 必填，查询字符串
-            - budget (Optional[int]): 可选，token 预算限制
+            - budget (Optional[int]): 可选，token 预算限制，默认为 DEFAULT_TOKEN_BUDGET
             - maxBadAttempt (Optional[int]): 可选，最大失败尝试次数
+            - noCache (bool): 可选，为 True 时跳过答案缓存强制重新研究（结果仍会写入缓存）
     
     Returns:
-        Dict[str, str]: 包含请求 ID 的字典，格式为 {"requestId": "<timestamp>"}
+        Dict[str, str]: 包含请求 ID 的字典，格式为 {"requestId": "<uuid>"}
     
     Raises:
         HTTPException: 当查询字符串为空时抛出 400 错误
     
     Note:
-        - 生成基于时间戳的唯一请求 ID
+        - 生成 uuid4 请求 ID，多个 worker 同时接收请求也不会冲突
         - 为每个请求创建 token 和 action 追踪器
-        - 异步启动查询处理任务
+        - 在共享状态后端登记任务，任意 worker 均可提供该任务的事件流
+        - 异步启动查询处理任务，结束后释放本地追踪器
     """
     if not request.q:
         raise HTTPException(status_code=400, detail="Query (q) is required")
     
-    request_id = str(int(datetime.now().timestamp() * 1000))
+    request_id = uuid.uuid4().hex
     
     # Create new trackers for this request
+    budget = request.budget or settings.DEFAULT_TOKEN_BUDGET
+    token_tracker = TokenTracker(budget)
     trackers[request_id] = {
-        "token_tracker": TokenTracker(request.budget),
-        "action_tracker": ActionTracker()
+        "token_tracker": token_tracker,
+        "action_tracker": ActionTracker(),
+        "planner": BudgetPlanner(token_tracker)
     }
+    await state_backend.create_task(request_id)
     
     # Start query processing in background
     agent = Agent()
-    asyncio.create_task(agent.process_query(
+    task = asyncio.create_task(agent.process_query(
         request_id=request_id,
         query=request.q,
-        budget=request.budget,
+        budget=budget,
         max_bad_attempt=request.maxBadAttempt,
         token_tracker=trackers[request_id]["token_tracker"],
-        action_tracker=trackers[request_id]["action_tracker"]
+        action_tracker=trackers[request_id]["action_tracker"],
+        planner=trackers[request_id]["planner"],
+        no_cache=request.noCache
     ))
+    running[request_id] = task
+    
+    def forget(_: asyncio.Task) -> None:
+        trackers.pop(request_id, None)
+        running.pop(request_id, None)
+    
+    task.add_done_callback(forget)
     
     return {"requestId": request_id}
 
 @app.get("/api/v1/stream/{request_id}")
-async def stream(request_id: str, request: Request) -> EventSourceResponse:
+async def stream(request_id: str, request: Request, protocol: int = 1, compress: bool = False) -> EventSourceResponse:
     """处理实时流式事件的接口。
     
     Args:
         request_id (str): 请求 ID，由 query 接口生成
         request (Request): FastAPI 请求对象
+        protocol (int): 流协议版本，1（默认）为完整事件，2 为快照加增量补丁
+        compress (bool): 是否按 Accept-Encoding 对本连接启用 gzip/deflate 压缩
     
     Returns:
         EventSourceResponse: SSE 事件流响应
@@ -144,50 +283,106 @@ async def stream(request_id: str, request: Request) -> EventSourceResponse:
         - 流式返回处理过程中的事件
         - 支持客户端断开连接检测
         - 发生错误时返回错误信息和追踪器状态
-        - 完成后自动清理追踪器资源
+        - 任务状态与事件从共享状态后端读取，无需粘性会话
+        - 协议 v2 先发送 snapshot 事件，之后仅发送 JSON-patch 风格的 patch 事件
+          （额外支持 append 操作追加字符串尾部），未变化时不发送
+        - 未指定 protocol 的客户端保持原有格式
+        - 开启 CANCEL_ON_LAST_SUBSCRIBER 时，最后一个订阅者断开且宽限期内无人重连则取消任务
     """
-    if request_id not in trackers:
+    if await state_backend.get_status(request_id) is None:
         raise HTTPException(status_code=404, detail="Invalid request ID")
     
-    async def event_generator() -> AsyncGenerator[Dict, None]:
+    async def current_snapshot() -> Dict[str, Any]:
+        if request_id in trackers:
+            return tracker_snapshot(
+                trackers[request_id]["token_tracker"],
+                trackers[request_id]["action_tracker"],
+                trackers[request_id]["planner"]
+            )
+        return await state_backend.get_snapshot(request_id) or {}
+    
+    async def current_trackers() -> Dict[str, Any]:
+        snapshot = await current_snapshot()
+        return {
+            "tokenUsage": snapshot.get("tokenUsage", 0),
+            "actionState": snapshot.get("actionState")
+        }
+    
+    async def subscription(
+        opening: Callable[[], AsyncGenerator[Dict, None]],
+        on_event: Callable[[Any], Awaitable[Optional[Dict]]],
+        on_error: Callable[[Dict[str, Any]], Dict]
+    ) -> AsyncGenerator[Dict, None]:
+        # Subscriber bookkeeping, disconnects and errors are the same for every
+        # protocol; the callbacks only decide how messages are encoded.
+        SSE_SUBSCRIBERS.inc()
+        await state_backend.update_subscribers(request_id, 1)
         try:
-            # Send initial connection confirmation
-            yield {
-                "event": "connected",
-                "data": {
-                    "requestId": request_id,
-                    "trackers": {
-                        "tokenUsage": trackers[request_id]["token_tracker"].get_total_usage(),
-                        "actionState": trackers[request_id]["action_tracker"].get_state()
-                    }
-                }
-            }
+            async for message in opening():
+                yield message
             
             agent = Agent()
             async for event in agent.stream_events(request_id):
                 if await request.is_disconnected():
                     break
-                if isinstance(event, dict):
-                    yield {"data": event}
-                else:
-                    yield {"data": event.model_dump()}
+                message = await on_event(event)
+                if message:
+                    yield message
                 
         except Exception as e:
+            yield on_error({
+                "message": str(e),
+                "trackers": await current_trackers()
+            })
+        finally:
+            SSE_SUBSCRIBERS.dec()
+            # The generator may be cancelled on disconnect, so don't await here.
+            spawn(unsubscribe(request_id))
+    
+    def event_generator() -> AsyncGenerator[Dict, None]:
+        async def opening() -> AsyncGenerator[Dict, None]:
+            # Send initial connection confirmation
             yield {
-                "event": "error",
+                "event": "connected",
                 "data": {
-                    "message": str(e),
-                    "trackers": {
-                        "tokenUsage": trackers[request_id]["token_tracker"].get_total_usage(),
-                        "actionState": trackers[request_id]["action_tracker"].get_state()
-                    }
+                    "requestId": request_id,
+                    "trackers": await current_trackers()
                 }
             }
-        finally:
-            if request_id in trackers:
-                del trackers[request_id]
+        
+        async def on_event(event: Any) -> Dict:
+            return {"data": event if isinstance(event, dict) else event.model_dump()}
+        
+        return subscription(opening, on_event, lambda error: {"event": "error", "data": error})
+    
+    def delta_generator() -> AsyncGenerator[Dict, None]:
+        encoder = DeltaEncoder()
+        
+        async def opening() -> AsyncGenerator[Dict, None]:
+            yield {
+                "event": "connected",
+                "data": fast_json.dumps({"requestId": request_id, "protocol": PROTOCOL_DELTA})
+            }
+            yield encoded(encoder.encode({**progress_state(await current_snapshot()), "event": None}))
+        
+        async def on_event(event: Any) -> Optional[Dict]:
+            data = event.get("data") if isinstance(event, dict) else event.model_dump(mode="json")
+            if isinstance(data, dict) and data.get("type") in ("final", "cancelled"):
+                return {"event": data["type"], "data": fast_json.dumps(data)}
+            message = encoder.encode({**progress_state(await current_snapshot()), "event": data})
+            return encoded(message) if message else None
+        
+        return subscription(opening, on_event, lambda error: {"event": "error", "data": fast_json.dumps(error)})
     
-    return EventSourceResponse(event_generator())
+    def encoded(message: Dict[str, Any]) -> Dict[str, Any]:
+        return {"event": message["event"], "data": fast_json.dumps(message["data"])}
+    
+    if protocol < PROTOCOL_DELTA:
+        return EventSourceResponse(event_generator())
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", "")) if compress else None
+    if encoding:
+        return CompressedEventSourceResponse(delta_generator(), encoding=encoding)
+    return EventSourceResponse(delta_generator())
 
 @app.get("/api/v1/task/{request_id}")
 async def get_task(request_id: str) -> Dict:
@@ -205,9 +400,79 @@ async def get_task(request_id: str) -> Dict:
     Note:
         - 从本地文件系统读取任务结果
         - 结果以 JSON 格式存储在 tasks 目录下
+        - 文件读取与解析在线程中执行，避免阻塞事件循环
     """
     task_path = Path.cwd() / "tasks" / f"{request_id}.json"
     try:
-        return json.loads(task_path.read_text())
+        return await asyncio.to_thread(lambda: json.loads(task_path.read_text()))
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Task not found")
+
+@app.delete("/api/v1/task/{request_id}")
+async def delete_task(request_id: str) -> Dict[str, str]:
+    """取消正在运行的任务。
+    
+    Args:
+        request_id (str): 请求 ID，由 query 接口生成
+    
+    Returns:
+        Dict[str, str]: {"requestId": "<id>", "status": "cancelling"}
+    
+    Raises:
+        HTTPException: 当任务不存在时抛出 404 错误，任务已结束时抛出 409 错误
+    
+    Note:
+        - 取消会中断进行中的搜索、读取与 LLM 调用，并释放预留的预算
+        - 任务结束后状态为 cancelled，事件流以 cancelled 事件结束
+    """
+    status = await state_backend.get_status(request_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if not await cancel_task(request_id):
+        raise HTTPException(status_code=409, detail=f"Task is already {status['status']}")
+    return {"requestId": request_id, "status": "cancelling"}
+
+@app.get("/api/v1/task/{request_id}/trace")
+async def get_task_trace(request_id: str, format: str = "chrome") -> Dict:
+    """获取指定任务的执行追踪。
+    
+    Args:
+        request_id (str): 请求 ID，由 query 接口生成
+        format (str): 导出格式，可选 "chrome"（默认）、"otlp" 或 "json"
+    
+    Returns:
+        Dict: 追踪数据，chrome 格式可直接在 chrome://tracing 或 Perfetto 中打开
+    
+    Raises:
+        HTTPException: 当追踪不存在（未开始或已被淘汰）时抛出 404 错误，
+            格式不支持时抛出 400 错误
+    
+    Note:
+        - 每个任务、工具调用和上游请求各对应一个 span
+        - span 记录起止时间、token、字节数与缓存状态
+        - 追踪保存在有界的内存存储中，最旧的任务先被淘汰
+    """
+    trace = tracer.get_trace(request_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    if format == "chrome":
+        return trace.to_chrome()
+    if format == "otlp":
+        return trace.to_otlp()
+    if format == "json":
+        return trace.to_dict()
+    raise HTTPException(status_code=400, detail=f"Unsupported trace format: {format}")
+
+@app.get("/metrics")
+async def metrics() -> Response:
+    """以 Prometheus 文本格式导出运行指标。
+    
+    Returns:
+        Response: Prometheus exposition 格式的指标文本
+    
+    Note:
+        - 包含各工具与上游的延迟直方图、token 计数
+        - 包含进行中任务数、SSE 订阅数、队列深度
+        - 包含各上游的重试与错误计数以及缓存命中率
+    """
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
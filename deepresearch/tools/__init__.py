@@ -1,17 +1,24 @@
 from .jina_search import JinaSearch
 from .brave_search import BraveSearch
+from .search_router import SearchRouter
 from .read import Reader
 from .evaluator import Evaluator
 from .error_analyzer import ErrorAnalyzer
 from .query_rewriter import QueryRewriter
 from .dedup import Deduplicator
+from .content_processor import ContentProcessor
+from .diary import DiaryCompactor, RollingDiary
 
 __all__ = [
     "JinaSearch",
     "BraveSearch",
+    "SearchRouter",
     "Reader",
     "Evaluator",
     "ErrorAnalyzer",
     "QueryRewriter",
-    "Deduplicator"
+    "Deduplicator",
+    "ContentProcessor",
+    "DiaryCompactor",
+    "RollingDiary"
 ]
@@ -5,36 +5,51 @@ import httpx
 from ..config import settings
 from ..types import BraveSearchResponse
 from ..utils.token_tracker import TokenTracker
+from ..utils.metrics import instrument_tool, track_upstream
+from ..utils.singleflight import inflight
+from ..utils import fast_json
+from ..utils.http_client import get_http_client
+from ..utils.timeouts import stage_timeout
 
 class BraveSearch:
     @staticmethod
+    @instrument_tool("brave-search")
     async def search(query: str, tracker: Optional[TokenTracker] = None) -> Tuple[BraveSearchResponse, int]:
+        query = " ".join(query.split())
+        async with stage_timeout("search"):
+            response_obj, tokens = await inflight.do(("brave-search", query), lambda: BraveSearch._search(query))
+        if tracker:
+            await tracker.track_usage("brave-search", tokens)
+        return response_obj, tokens
+
+    @staticmethod
+    async def _search(query: str) -> Tuple[BraveSearchResponse, int]:
         try:
             headers = {
                 "Accept": "application/json",
                 "X-Subscription-Token": settings.BRAVE_API_KEY
             }
             
-            async with httpx.AsyncClient() as client:
+            client = get_http_client()
+            with track_upstream("brave-search") as span:
                 response = await client.get(
                     "https://api.search.brave.com/res/v1/web/search",
                     headers=headers,
                     params={"q": query}
                 )
-                response_data = response.json()
-                response_obj = BraveSearchResponse(**response_data)
+                span.set(status=response.status_code, bytes=len(response.content))
+                if response.is_error:
+                    raise ValueError(f"Brave search failed with status {response.status_code}")
+                response_obj = fast_json.decode(BraveSearchResponse, response.content)
                 
-                logging.info("Brave search: %s", {
-                    "query": query,
-                    "results": len(response_obj.web.get("results", [])) if response_obj.web else 0
-                })
+            logging.info("Brave search: %s", {
+                "query": query,
+                "results": len(response_obj.web.get("results", [])) if response_obj.web else 0
+            })
                 
-                # Brave doesn't provide token usage, estimate based on response size
-                tokens = len(str(response_data)) // 4  # Rough estimate
-                if tracker:
-                    await tracker.track_usage("brave-search", tokens)
-                    
-                return response_obj, tokens
+            # Brave doesn't provide token usage, estimate based on response size
+            tokens = len(response.content) // 4  # Rough estimate
+            return response_obj, tokens
                 
         except httpx.HTTPError as e:
             logging.error("HTTP error in Brave search: %s", str(e))
@@ -0,0 +1,122 @@
+import hashlib
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from ..config import settings
+from ..types import ContentChunk, ProcessedContent, SearchResult
+from ..utils.metrics import instrument_tool
+from ..utils.tracer import current_span
+from ..utils.worker_pool import WorkerPool
+from ..utils.lazy import lazy
+
+# The functions below run inside pool workers, so they are module-level and only
+# take and return plain Python values.
+
+_IMAGE_RE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+_LINK_RE = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_LINK_ONLY_LINE_RE = re.compile(r"^\s*(?:[-*]\s*)?(?:\[[^\]]*\]\([^)]*\)\s*[|·•]?\s*)+$")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def clean_markdown(text: str) -> str:
+    # Drop images and navigation-style lines made only of links, keep link text.
+    lines = [line.rstrip() for line in _IMAGE_RE.sub("", text).splitlines()
+             if not _LINK_ONLY_LINE_RE.match(line)]
+    return _BLANK_LINES_RE.sub("\n\n", _LINK_RE.sub(r"\1", "\n".join(lines))).strip()
+
+
+def chunk_text(text: str, chunk_size: int) -> List[str]:
+    chunks: List[str] = []
+    current: List[str] = []
+    length = 0
+    for paragraph in text.split("\n\n"):
+        if current and length + len(paragraph) > chunk_size:
+            chunks.append("\n\n".join(current))
+            current, length = [], 0
+        while len(paragraph) > chunk_size:
+            chunks.append(paragraph[:chunk_size])
+            paragraph = paragraph[chunk_size:]
+        current.append(paragraph)
+        length += len(paragraph) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def score_chunk(chunk: str, query_terms: List[str]) -> float:
+    if not query_terms:
+        return 0.0
+    words = _WORD_RE.findall(chunk.lower())
+    if not words:
+        return 0.0
+    counts: Dict[str, int] = {}
+    for word in words:
+        counts[word] = counts.get(word, 0) + 1
+    matched = sum(1 for term in query_terms if term in counts)
+    density = sum(counts.get(term, 0) for term in query_terms) / len(words)
+    return matched / len(query_terms) + density
+
+
+def simhash(text: str, shingle: int = 3) -> int:
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return 0
+    # Count hash bytes per position instead of updating 64 bit weights per shingle.
+    tables = [[0] * 256 for _ in range(8)]
+    total = 0
+    for i in range(max(len(words) - shingle + 1, 1)):
+        digest = hashlib.blake2b(" ".join(words[i:i + shingle]).encode(), digest_size=8).digest()
+        for table, byte in zip(tables, digest):
+            table[byte] += 1
+        total += 1
+    fingerprint = 0
+    for position, table in enumerate(tables):
+        for bit in range(8):
+            ones = sum(count for byte, count in enumerate(table) if byte >> bit & 1)
+            if 2 * ones > total:
+                fingerprint |= 1 << (position * 8 + bit)
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def process_text(text: str, query: str, chunk_size: int) -> Dict[str, Any]:
+    content = clean_markdown(text)
+    query_terms = list(dict.fromkeys(_WORD_RE.findall(query.lower())))
+    chunks = chunk_text(content, chunk_size)
+    return {
+        "content": content,
+        "chunks": [(chunk, score_chunk(chunk, query_terms)) for chunk in chunks],
+        "fingerprint": simhash(content),
+    }
+
+
+pool = lazy(lambda: WorkerPool(
+    "content-pool",
+    mode=settings.CONTENT_POOL_MODE,
+    workers=settings.CONTENT_POOL_WORKERS,
+    max_pending=settings.CONTENT_POOL_MAX_PENDING
+))
+
+
+class ContentProcessor:
+    @staticmethod
+    @instrument_tool("content-processor")
+    async def process(page: SearchResult, query: str = "", chunk_size: Optional[int] = None) -> ProcessedContent:
+        current_span().set(bytes=len(page.content), pool=pool.mode)
+        result = await pool.run(process_text, page.content, query, chunk_size or settings.CONTENT_CHUNK_SIZE)
+        logging.info("Processed content: %s", {
+            "url": page.url,
+            "chunks": len(result["chunks"])
+        })
+        # Worker output is built by our own code, so skip re-validating it.
+        return ProcessedContent.model_construct(
+            url=page.url,
+            content=result["content"],
+            chunks=[ContentChunk.model_construct(text=text, score=score) for text, score in result["chunks"]],
+            fingerprint=result["fingerprint"]
+        )
@@ -1,17 +1,41 @@
-import json
 import logging
 from typing import Dict, Any, Optional, Tuple, List
 
-from openai import AsyncOpenAI
-
-from ..config import settings, modelConfigs
+from ..config import settings
 from ..types import DedupResponse
 from ..utils.token_tracker import TokenTracker
+from ..utils.metrics import instrument_tool
+from ..utils.model_router import model_router
+
+DEDUP_FUNCTION = {
+    "name": "dedup_queries",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "think": {
+                "type": "string",
+                "description": "Strategic reasoning about the overall deduplication approach"
+            },
+            "unique_queries": {
+                "type": "array",
+                "items": {
+                    "type": "string",
+                    "description": "Unique query that passed the deduplication process, must be less than 30 characters"
+                },
+                "description": "Array of semantically unique queries"
+            },
+            "confidence": {
+                "type": "number",
+                "description": "Confidence in the deduplication result, from 0 (guess) to 1 (certain)"
+            }
+        },
+        "required": ["think", "unique_queries", "confidence"]
+    }
+}
 
 class Deduplicator:
-    client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-    
     @staticmethod
+    @instrument_tool("dedup")
     async def dedup_queries(new_queries: List[str], existing_queries: List[str], tracker: Optional[TokenTracker] = None) -> Tuple[List[str], int]:
         try:
             prompt = f"""You are an expert in semantic similarity analysis. Given a set of queries (setA) and a set of queries (setB)
@@ -64,40 +88,13 @@ Now with threshold set to 0.2; run FilterSetA on the following:
 SetA: {new_queries}
 SetB: {existing_queries}"""
 
-            response = await Deduplicator.client.chat.completions.create(
-                model=modelConfigs["dedup"]["model"],
-                temperature=modelConfigs["dedup"]["temperature"],
-                functions=[{
-                    "name": "dedup_queries",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "think": {
-                                "type": "string",
-                                "description": "Strategic reasoning about the overall deduplication approach"
-                            },
-                            "unique_queries": {
-                                "type": "array",
-                                "items": {
-                                    "type": "string",
-                                    "description": "Unique query that passed the deduplication process, must be less than 30 characters"
-                                },
-                                "description": "Array of semantically unique queries"
-                            }
-                        },
-                        "required": ["think", "unique_queries"]
-                    }
-                }],
-                messages=[{"role": "user", "content": prompt}]
+            result, tokens = await model_router.call_function(
+                "dedup", prompt, DEDUP_FUNCTION, DedupResponse, tracker
             )
 
-            json_data = json.loads(response.choices[0].message.function_call.arguments)
-            logging.info("Dedup: %s", json_data["unique_queries"])
-            
-            if tracker:
-                await tracker.track_usage("dedup", response)
+            logging.info("Dedup: %s", result.unique_queries)
             
-            return json_data["unique_queries"], response.usage.total_tokens
+            return result.unique_queries, tokens
 
         except Exception as e:
             logging.error("Error in deduplication analysis: %s", str(e))
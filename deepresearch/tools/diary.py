@@ -0,0 +1,146 @@
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from ..config import settings
+from ..types import DiaryDigestResponse
+from ..utils.token_tracker import TokenTracker
+from ..utils.metrics import instrument_tool
+from ..utils.model_router import model_router
+
+
+# Meant as a ceiling, not an average: English runs about 4 characters per token,
+# while CJK and most other non-ASCII text is close to one token per character.
+ASCII_CHARS_PER_TOKEN = 3
+_ELLIPSIS = " …"
+
+
+def _cost(char: str) -> int:
+    # In thirds of a token.
+    return 1 if char < "\x80" else ASCII_CHARS_PER_TOKEN
+
+
+def estimate_tokens(text: str) -> int:
+    units = sum(_cost(char) for char in text)
+    return -(-units // ASCII_CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    units = max(max_tokens, 0) * ASCII_CHARS_PER_TOKEN - sum(_cost(char) for char in _ELLIPSIS)
+    for end, char in enumerate(text):
+        units -= _cost(char)
+        if units < 0:
+            return text[:end] + _ELLIPSIS
+    return text
+
+
+DIGEST_FUNCTION = {
+    "name": "update_digest",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "digest": {
+                "type": "string",
+                "description": "The updated digest covering the old digest and the new steps"
+            }
+        },
+        "required": ["digest"]
+    }
+}
+
+
+class DiaryCompactor:
+    @staticmethod
+    @instrument_tool("diary-compactor")
+    async def summarize(digest: str, steps: List[str], max_tokens: int,
+                        tracker: Optional[TokenTracker] = None) -> Tuple[str, int]:
+        try:
+            steps_text = "\n".join(steps)
+            prompt = f"""You maintain a running digest of a search and reasoning process. Fold the new steps into the existing digest.
+
+<rules>
+1. Keep every search query, visited URL and answer attempt, in chronological order
+2. Keep facts that were found and the reasons answers were rejected
+3. Merge repeated or near-identical steps and note how often they were repeated
+4. Drop reasoning that did not lead anywhere
+5. Stay under {max_tokens * 3 // 4} words
+</rules>
+
+<digest>
+{digest or "(empty)"}
+</digest>
+
+<new-steps>
+{steps_text}
+</new-steps>"""
+
+            result, tokens = await model_router.call_function(
+                "diaryCompactor", prompt, DIGEST_FUNCTION, DiaryDigestResponse, tracker, label="diary-compactor"
+            )
+            logging.info("Diary compacted: %s", {"steps": len(steps), "digest_tokens": estimate_tokens(result.digest)})
+
+            return truncate_to_tokens(result.digest, max_tokens), tokens
+
+        except Exception as e:
+            logging.error("Error in diary compaction: %s", str(e))
+            raise
+
+
+class RollingDiary:
+    """Diary of research steps for ErrorAnalyzer prompts with bounded size.
+
+    The newest `recent_steps` entries stay verbatim. Older entries are folded into a
+    digest incrementally: each compaction only sends the previous digest plus the
+    entries that aged out since the last one, and the digest is reused across
+    analyses. render() enforces a hard token ceiling on the result.
+    """
+
+    def __init__(self, recent_steps: Optional[int] = None, digest_tokens: Optional[int] = None):
+        self.recent_steps = recent_steps or settings.DIARY_RECENT_STEPS
+        self.digest_tokens = digest_tokens or settings.DIARY_DIGEST_TOKENS
+        self.entries: List[str] = []
+        self.digest = ""
+        self.digested = 0
+        self._lock = asyncio.Lock()
+
+    def add(self, entry: str) -> None:
+        self.entries.append(entry)
+
+    def extend(self, entries: List[str]) -> None:
+        self.entries.extend(entries)
+
+    async def compact(self, tracker: Optional[TokenTracker] = None) -> None:
+        async with self._lock:
+            cutoff = len(self.entries) - self.recent_steps
+            if cutoff <= self.digested:
+                return
+            self.digest, _ = await DiaryCompactor.summarize(
+                self.digest, self.entries[self.digested:cutoff], self.digest_tokens, tracker
+            )
+            self.digested = cutoff
+
+    def render(self, max_tokens: int) -> str:
+        return render_diary(self.entries[self.digested:], self.digest, self.digested, max_tokens)
+
+
+def render_diary(entries: List[str], digest: str, digested: int, max_tokens: int) -> str:
+    # Keep the newest entries first; whatever does not fit is dropped oldest-first.
+    digest_part = ""
+    if digest:
+        digest_part = f"<digest steps=\"{digested}\">\n{truncate_to_tokens(digest, max_tokens // 2)}\n</digest>\n"
+    # Room for the omission note is held back, since it is only known at the end.
+    budget = max_tokens - estimate_tokens(digest_part) - estimate_tokens(f"({len(entries)} earlier steps omitted)\n")
+    kept: List[str] = []
+    for entry in reversed(entries):
+        cost = estimate_tokens(entry) + 1
+        if cost > budget:
+            if not kept:
+                kept.append(truncate_to_tokens(entry, budget))
+            break
+        kept.append(entry)
+        budget -= cost
+    omitted = len(entries) - len(kept)
+    note = f"({omitted} earlier steps omitted)\n" if omitted else ""
+    return digest_part + note + "\n".join(reversed(kept))
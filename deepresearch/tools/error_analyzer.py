@@ -1,20 +1,37 @@
 import json
 import logging
-from typing import Dict, Any, Optional, Tuple, List
+from typing import Dict, Any, Optional, Tuple, List, Union
 
-from openai import AsyncOpenAI
-
-from ..config import settings, modelConfigs
+from ..config import settings
 from ..types import ErrorAnalysisResponse
 from ..utils.token_tracker import TokenTracker
+from ..utils.metrics import instrument_tool
+from ..utils.model_router import model_router
+from .diary import RollingDiary, estimate_tokens, render_diary
 
-class ErrorAnalyzer:
-    client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-    
-    @staticmethod
-    async def analyze_steps(diary_context: List[str], tracker: Optional[TokenTracker] = None) -> Tuple[ErrorAnalysisResponse, int]:
-        try:
-            prompt = f"""You are an expert at analyzing search and reasoning processes. Your task is to analyze the given sequence of steps and identify what went wrong in the search process.
+ANALYZE_FUNCTION = {
+    "name": "analyze_steps",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "recap": {
+                "type": "string",
+                "description": "Recap of the actions taken and the steps conducted"
+            },
+            "blame": {
+                "type": "string",
+                "description": "Which action or the step was the root cause of the answer rejection"
+            },
+            "improvement": {
+                "type": "string",
+                "description": "Suggested key improvement for the next iteration, do not use bullet points, be concise and hot-take vibe."
+            }
+        },
+        "required": ["recap", "blame", "improvement"]
+    }
+}
+
+ANALYZE_PROMPT = """You are an expert at analyzing search and reasoning processes. Your task is to analyze the given sequence of steps and identify what went wrong in the search process.
 
 <rules>
 1. The sequence of actions taken
@@ -28,52 +45,44 @@ Analyze the steps and provide detailed feedback following these guidelines:
 - In the recap: Summarize key actions chronologically, highlight patterns, and identify where the process started to go wrong
 - In the blame: Point to specific steps or patterns that led to the inadequate answer
 - In the improvement: Provide actionable suggestions that could have led to a better outcome
-</rules>
+</rules>"""
+
+# The function schema is sent with every call and counts against the ceiling too.
+TEMPLATE_TOKENS = estimate_tokens(ANALYZE_PROMPT + "\n\n") + estimate_tokens(json.dumps(ANALYZE_FUNCTION))
 
-{diary_context}"""
+class ErrorAnalyzer:
+    @staticmethod
+    @instrument_tool("error-analyzer")
+    async def analyze_steps(diary_context: Union[List[str], RollingDiary], tracker: Optional[TokenTracker] = None) -> Tuple[ErrorAnalysisResponse, int]:
+        try:
+            # The ceiling covers the whole call, so the diary gets what the instructions
+            # and the function schema leave over.
+            ceiling = max(settings.ERROR_ANALYZER_MAX_TOKENS - TEMPLATE_TOKENS, 0)
+            # A RollingDiary folds aged-out steps into its reusable digest; a plain list
+            # is only cut to the ceiling. Either way the diary stays under the limit.
+            if isinstance(diary_context, RollingDiary):
+                try:
+                    await diary_context.compact(tracker)
+                except Exception as e:
+                    # The previous digest is still valid; the steps not yet folded in
+                    # are cut oldest-first instead.
+                    logging.warning("Diary compaction failed, truncating instead: %s", str(e))
+                diary_text = diary_context.render(ceiling)
+            else:
+                diary_text = render_diary(diary_context, "", 0, ceiling)
 
-            response = await ErrorAnalyzer.client.chat.completions.create(
-                model=modelConfigs["errorAnalyzer"]["model"],
-                temperature=modelConfigs["errorAnalyzer"]["temperature"],
-                functions=[{
-                    "name": "analyze_steps",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "recap": {
-                                "type": "string",
-                                "description": "Recap of the actions taken and the steps conducted"
-                            },
-                            "blame": {
-                                "type": "string",
-                                "description": "Which action or the step was the root cause of the answer rejection"
-                            },
-                            "improvement": {
-                                "type": "string",
-                                "description": "Suggested key improvement for the next iteration, do not use bullet points, be concise and hot-take vibe."
-                            }
-                        },
-                        "required": ["recap", "blame", "improvement"]
-                    }
-                }],
-                messages=[{"role": "user", "content": prompt}]
+            prompt = f"{ANALYZE_PROMPT}\n\n{diary_text}"
+
+            result, tokens = await model_router.call_function(
+                "errorAnalyzer", prompt, ANALYZE_FUNCTION, ErrorAnalysisResponse, tracker, label="error-analyzer"
             )
             
-            try:
-                json_data = json.loads(response.choices[0].message.function_call.arguments)
-            except (json.JSONDecodeError, AttributeError) as e:
-                logging.error("JSON decode error: %s", str(e))
-                raise
-            
             logging.info("Error analysis: %s", {
-                "is_valid": not json_data["blame"],
-                "reason": json_data["blame"] or "No issues found"
+                "is_valid": not result.blame,
+                "reason": result.blame or "No issues found"
             })
             
-            if tracker:
-                await tracker.track_usage("error-analyzer", response)
-            
-            return ErrorAnalysisResponse(**json_data), response.usage.total_tokens
+            return result, tokens
         
         except Exception as e:
             logging.error("Error in error analysis: %s", str(e))
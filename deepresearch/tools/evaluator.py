@@ -1,17 +1,37 @@
-import json
 import logging
 from typing import Dict, Any, Optional, Tuple
 
-from openai import AsyncOpenAI
-
-from ..config import settings, modelConfigs
+from ..config import settings
 from ..types import EvaluationResponse
 from ..utils.token_tracker import TokenTracker
+from ..utils.metrics import instrument_tool
+from ..utils.model_router import model_router
+
+EVALUATE_FUNCTION = {
+    "name": "evaluate_answer",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "is_definitive": {
+                "type": "boolean",
+                "description": "Whether the answer provides a definitive response without uncertainty or 'I don't know' type statements"
+            },
+            "reasoning": {
+                "type": "string",
+                "description": "Explanation of why the answer is or isn't definitive"
+            },
+            "confidence": {
+                "type": "number",
+                "description": "Confidence in the verdict, from 0 (guess) to 1 (certain)"
+            }
+        },
+        "required": ["is_definitive", "reasoning", "confidence"]
+    }
+}
 
 class Evaluator:
-    client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-    
     @staticmethod
+    @instrument_tool("evaluator")
     async def evaluate_answer(question: str, answer: str, tracker: Optional[TokenTracker] = None) -> Tuple[EvaluationResponse, int]:
         try:
             prompt = f"""You are an evaluator of answer definitiveness. Analyze if the given answer provides a definitive response or not.
@@ -46,44 +66,17 @@ Now evaluate this pair:
 Question: {question}
 Answer: {answer}"""
 
-            response = await Evaluator.client.chat.completions.create(
-                model=modelConfigs["evaluator"]["model"],
-                temperature=modelConfigs["evaluator"]["temperature"],
-                functions=[{
-                    "name": "evaluate_answer",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "is_definitive": {
-                                "type": "boolean",
-                                "description": "Whether the answer provides a definitive response without uncertainty or 'I don't know' type statements"
-                            },
-                            "reasoning": {
-                                "type": "string",
-                                "description": "Explanation of why the answer is or isn't definitive"
-                            }
-                        },
-                        "required": ["is_definitive", "reasoning"]
-                    }
-                }],
-                messages=[{"role": "user", "content": prompt}]
+            result, tokens = await model_router.call_function(
+                "evaluator", prompt, EVALUATE_FUNCTION, EvaluationResponse, tracker
             )
             
-            try:
-                json_data = json.loads(response.choices[0].message.function_call.arguments)
-            except (json.JSONDecodeError, AttributeError) as e:
-                logging.error("JSON decode error: %s", str(e))
-                raise
-            
             logging.info("Evaluation: %s", {
-                "definitive": json_data["is_definitive"],
-                "reason": json_data["reasoning"]
+                "definitive": result.is_definitive,
+                "confidence": result.confidence,
+                "reason": result.reasoning
             })
             
-            if tracker:
-                await tracker.track_usage("evaluator", response)
-            
-            return EvaluationResponse(**json_data), response.usage.total_tokens
+            return result, tokens
         
         except Exception as e:
             logging.error("Error in answer evaluation: %s", str(e))
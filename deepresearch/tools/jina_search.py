@@ -5,10 +5,25 @@ import httpx
 from ..config import settings
 from ..types import SearchResponse
 from ..utils.token_tracker import TokenTracker
+from ..utils.metrics import instrument_tool, track_upstream
+from ..utils.singleflight import inflight
+from ..utils import fast_json
+from ..utils.http_client import get_http_client
+from ..utils.timeouts import stage_timeout
 
 class JinaSearch:
     @staticmethod
+    @instrument_tool("jina-search")
     async def search(query: str, tracker: Optional[TokenTracker] = None) -> Tuple[SearchResponse, int]:
+        query = " ".join(query.split())
+        async with stage_timeout("search"):
+            response_obj, tokens = await inflight.do(("jina-search", query), lambda: JinaSearch._search(query))
+        if tracker:
+            await tracker.track_usage("jina-search", tokens)
+        return response_obj, tokens
+
+    @staticmethod
+    async def _search(query: str) -> Tuple[SearchResponse, int]:
         try:
             headers = {
                 "Accept": "application/json",
@@ -16,31 +31,27 @@ class JinaSearch:
                 "Content-Type": "application/json"
             }
             
-            async with httpx.AsyncClient() as client:
+            client = get_http_client()
+            with track_upstream("jina-search") as span:
                 response = await client.post(
                     "https://api.jina.ai/v1/search",
                     headers=headers,
                     json={"query": query}
                 )
-                response_data = response.json()
-                response_obj = SearchResponse(**response_data)
-                
+                span.set(status=response.status_code, bytes=len(response.content))
+                response_obj = fast_json.decode(SearchResponse, response.content)
                 if response_obj.code == 402:
                     raise ValueError(response_obj.readableMessage or "Insufficient balance")
-                    
                 if not response_obj.data:
                     raise ValueError("Invalid response data")
                     
-                logging.info("Jina search: %s", {
-                    "query": query,
-                    "results": len(response_obj.data) if response_obj.data else 0
-                })
+            logging.info("Jina search: %s", {
+                "query": query,
+                "results": len(response_obj.data) if response_obj.data else 0
+            })
                 
-                tokens = sum(result.usage.get("tokens", 0) for result in response_obj.data) if response_obj.data else 0
-                if tracker:
-                    await tracker.track_usage("jina-search", tokens)
-                    
-                return response_obj, tokens
+            tokens = sum(result.usage.get("tokens", 0) for result in response_obj.data) if response_obj.data else 0
+            return response_obj, tokens
                 
         except httpx.HTTPError as e:
             logging.error("HTTP error in Jina search: %s", str(e))
@@ -1,17 +1,39 @@
-import json
 import logging
 from typing import Dict, Any, Optional, Tuple, List
 
-from openai import AsyncOpenAI
-
-from ..config import settings, modelConfigs
+from ..config import settings
 from ..types import KeywordsResponse, SearchAction
 from ..utils.token_tracker import TokenTracker
+from ..utils.metrics import instrument_tool
+from ..utils.model_router import model_router
+
+REWRITE_FUNCTION = {
+    "name": "rewrite_query",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "think": {
+                "type": "string",
+                "description": "Strategic reasoning about query complexity and search approach"
+            },
+            "queries": {
+                "type": "array",
+                "items": {
+                    "type": "string",
+                    "description": "Search query, must be less than 30 characters"
+                },
+                "description": "Array of search queries, orthogonal to each other",
+                "minItems": 1,
+                "maxItems": 3
+            }
+        },
+        "required": ["think", "queries"]
+    }
+}
 
 class QueryRewriter:
-    client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-    
     @staticmethod
+    @instrument_tool("query-rewriter")
     async def rewrite_query(action: SearchAction, tracker: Optional[TokenTracker] = None) -> Tuple[List[str], int]:
         try:
             prompt = f"""You are an expert Information Retrieval Assistant. Transform user queries into precise keyword combinations with strategic reasoning and appropriate search operators.
@@ -43,42 +65,13 @@ Now, process this query:
 Input Query: {action.searchQuery}
 Intention: {action.think}"""
 
-            response = await QueryRewriter.client.chat.completions.create(
-                model=modelConfigs["queryRewriter"]["model"],
-                temperature=modelConfigs["queryRewriter"]["temperature"],
-                functions=[{
-                    "name": "rewrite_query",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "think": {
-                                "type": "string",
-                                "description": "Strategic reasoning about query complexity and search approach"
-                            },
-                            "queries": {
-                                "type": "array",
-                                "items": {
-                                    "type": "string",
-                                    "description": "Search query, must be less than 30 characters"
-                                },
-                                "description": "Array of search queries, orthogonal to each other",
-                                "minItems": 1,
-                                "maxItems": 3
-                            }
-                        },
-                        "required": ["think", "queries"]
-                    }
-                }],
-                messages=[{"role": "user", "content": prompt}]
+            result, tokens = await model_router.call_function(
+                "queryRewriter", prompt, REWRITE_FUNCTION, KeywordsResponse, tracker, label="query-rewriter"
             )
 
-            json_data = json.loads(response.choices[0].message.function_call.arguments)
-            logging.info("Query rewriter: %s", json_data["queries"])
-
-            if tracker:
-                await tracker.track_usage("query-rewriter", response)
+            logging.info("Query rewriter: %s", result.queries)
 
-            return json_data["queries"], response.usage.total_tokens
+            return result.queries, tokens
 
         except Exception as e:
             logging.error("Error in query rewriting: %s", str(e))
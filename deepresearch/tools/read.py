@@ -1,45 +1,189 @@
 import logging
 from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
 
 import httpx
 
 from ..config import settings
-from ..types import ReadResponse
+from ..types import ReadOptions, ReadResponse, SearchResult
 from ..utils.token_tracker import TokenTracker
+from ..utils.metrics import instrument_tool, track_upstream
+from ..utils.singleflight import inflight
+from ..utils import fast_json
+from ..utils.http_client import get_http_client
+from ..utils.timeouts import stage_timeout
+
+# Same rough estimate as Brave search and the diary.
+CHARS_PER_TOKEN = 4
+# Jina's text format puts metadata lines ("Title: ...") before this marker.
+_CONTENT_MARKER = "Markdown Content:\n"
+# Content-targeting options and the Jina headers they are sent as.
+_TARGET_HEADERS = {
+    "target_selector": "X-Target-Selector",
+    "remove_selector": "X-Remove-Selector",
+    "wait_for_selector": "X-Wait-For-Selector",
+    "token_budget": "X-Token-Budget",
+}
+
+def canonical_url(url: str) -> str:
+    # Scheme and host are case-insensitive and the fragment never reaches the server.
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", parts.query, ""))
+
+def byte_limit(options: ReadOptions) -> Optional[int]:
+    # The tighter of the byte cap and the token cap; 0 or None means no cap.
+    max_bytes = settings.READ_MAX_BYTES if options.max_bytes is None else options.max_bytes
+    max_tokens = settings.READ_MAX_TOKENS if options.max_tokens is None else options.max_tokens
+    limits = [limit for limit in (max_bytes, max_tokens * CHARS_PER_TOKEN) if limit and limit > 0]
+    return min(limits) if limits else None
+
+def parse_text(url: str, text: str) -> SearchResult:
+    head, marker, content = text.partition(_CONTENT_MARKER)
+    if not marker:
+        head, content = "", text
+    fields = dict(line.split(": ", 1) for line in head.splitlines() if ": " in line)
+    content = content.strip()
+    return SearchResult(
+        title=fields.get("Title", ""),
+        description=fields.get("Description", ""),
+        url=fields.get("URL Source", url),
+        content=content,
+        usage={"tokens": len(content) // CHARS_PER_TOKEN}
+    )
 
 class Reader:
     @staticmethod
-    async def read_url(url: str, tracker: Optional[TokenTracker] = None) -> Tuple[ReadResponse, int]:
-        data = {"url": url}
+    @instrument_tool("read")
+    async def read_url(url: str, tracker: Optional[TokenTracker] = None,
+                       options: Optional[ReadOptions] = None) -> Tuple[ReadResponse, int]:
+        options = options or ReadOptions()
+        # Reads of the same page with different caps or selectors are different requests.
+        key = ("read", canonical_url(url), options)
+        async with stage_timeout("read"):
+            response_obj, tokens = await inflight.do(key, lambda: Reader._read_url(url, options))
+        if tracker:
+            await tracker.track_usage("read", tokens)
+        return response_obj, tokens
+
+    @staticmethod
+    def _headers(options: ReadOptions, accept: str) -> Dict[str, str]:
         headers = {
-            "Accept": "application/json",
+            "Accept": accept,
             "Authorization": f"Bearer {settings.JINA_API_KEY}",
             "Content-Type": "application/json",
             "X-Retain-Images": "none",
             "X-Return-Format": "markdown"
         }
+        for field, header in _TARGET_HEADERS.items():
+            value = getattr(options, field)
+            if value:
+                headers[header] = str(value)
+        return headers
+
+    @staticmethod
+    def _check(response_obj: ReadResponse) -> None:
+        if response_obj.code == 402:
+            raise ValueError(response_obj.readableMessage or "Insufficient balance")
+        # An empty body is a failed read even with a 200, however it was fetched.
+        if not response_obj.data or not response_obj.data.content:
+            raise ValueError("Invalid response data")
+
+    @staticmethod
+    async def _read_url(url: str, options: ReadOptions) -> Tuple[ReadResponse, int]:
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "https://r.jina.ai/",
-                    headers=headers,
-                    json=data
-                )
-                response_data = response.json()
-                response_obj = ReadResponse(**response_data)
-                if response_obj.code == 402:
-                    raise ValueError(response_obj.readableMessage or "Insufficient balance")
-                if not response_obj.data:
-                    raise ValueError("Invalid response data")
-                logging.info("Read: %s", {
-                    "title": response_obj.data.title,
-                    "url": response_obj.data.url,
-                    "tokens": response_obj.data.usage.get("tokens", 0) if response_obj.data.usage else 0
-                })
-                tokens = response_obj.data.usage.get("tokens", 0) if response_obj.data.usage else 0
-                if tracker:
-                    await tracker.track_usage("read", tokens)
-                return response_obj, tokens
+            if settings.READ_STREAM:
+                response_obj = await Reader._stream_url(url, options)
+            else:
+                response_obj = await Reader._fetch_url(url, options)
+            tokens = response_obj.data.usage.get("tokens", 0) if response_obj.data.usage else 0
+            logging.info("Read: %s", {
+                "title": response_obj.data.title,
+                "url": response_obj.data.url,
+                "tokens": tokens,
+                "truncated": response_obj.truncated
+            })
+            return response_obj, tokens
         except httpx.HTTPError as e:
             logging.error("HTTP error in read_url: %s", str(e))
             raise
+
+    @staticmethod
+    async def _fetch_url(url: str, options: ReadOptions) -> ReadResponse:
+        # Buffered JSON read; the caps only trim the content after the fact.
+        client = get_http_client()
+        with track_upstream("jina-reader") as span:
+            response = await client.post(
+                "https://r.jina.ai/",
+                headers=Reader._headers(options, "application/json"),
+                json={"url": url}
+            )
+            span.set(status=response.status_code, bytes=len(response.content))
+            response_obj = fast_json.decode(ReadResponse, response.content)
+            Reader._check(response_obj)
+        limit = byte_limit(options)
+        data = response_obj.data
+        # Cut by UTF-8 bytes like the streamed path, so non-ASCII pages stay under the cap.
+        raw = data.content.encode()
+        if limit and len(raw) > limit:
+            tokens = data.usage.get("tokens", 0) if data.usage else 0
+            data.content = raw[:limit].decode("utf-8", errors="ignore")
+            data.usage = {**(data.usage or {}), "tokens": min(tokens, limit // CHARS_PER_TOKEN)}
+            response_obj.truncated = True
+        return response_obj
+
+    @staticmethod
+    async def _stream_url(url: str, options: ReadOptions) -> ReadResponse:
+        """Read the page as text and stop downloading once the cap is reached.
+
+        A cut-off JSON body can't be parsed, so this asks Jina for its plain-text
+        format and parses the metadata lines itself. Token usage is estimated from
+        the content that was kept.
+        """
+        client = get_http_client()
+        limit = byte_limit(options)
+        chunks = []
+        size = 0
+        truncated = False
+        with track_upstream("jina-reader") as span:
+            async with client.stream(
+                "POST",
+                "https://r.jina.ai/",
+                headers=Reader._headers(options, "text/plain"),
+                json={"url": url}
+            ) as response:
+                if response.is_error:
+                    body = await response.aread()
+                    span.set(status=response.status_code, bytes=len(body))
+                    raise ValueError(Reader._error_message(response.status_code, body))
+                async for chunk in response.aiter_bytes():
+                    if limit is not None and size + len(chunk) > limit:
+                        chunks.append(chunk[:limit - size])
+                        size = limit
+                        truncated = True
+                        break
+                    chunks.append(chunk)
+                    size += len(chunk)
+            span.set(status=response.status_code, bytes=size, truncated=truncated)
+            # A cap can split a multi-byte character; the partial tail is dropped.
+            text = b"".join(chunks).decode("utf-8", errors="ignore")
+            response_obj = ReadResponse(
+                code=response.status_code,
+                status=response.status_code,
+                data=parse_text(url, text),
+                truncated=truncated
+            )
+            Reader._check(response_obj)
+        return response_obj
+
+    @staticmethod
+    def _error_message(status: int, body: bytes) -> str:
+        # Jina reports errors as JSON even when text was requested.
+        try:
+            error: Any = fast_json.loads(body)
+        except ValueError:
+            error = None
+        if isinstance(error, dict):
+            message = error.get("readableMessage") or error.get("message")
+            if message:
+                return message
+        return "Insufficient balance" if status == 402 else f"Read failed with status {status}"
@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..types import BraveSearchResponse, SearchResponse, SearchResult
+from ..utils.token_tracker import TokenTracker
+from ..utils.metrics import UPSTREAM_RETRIES, instrument_tool
+from ..utils.tracer import current_span
+from .jina_search import JinaSearch
+from .brave_search import BraveSearch
+
+
+class ProviderStats:
+    def __init__(self, window: int = 100):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def record_success(self, latency: float) -> None:
+        self.latencies.append(latency)
+        self.error_rate *= 0.9
+        self.consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        self.error_rate = self.error_rate * 0.9 + 0.1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= settings.SEARCH_FAILURE_THRESHOLD:
+            # Back off from a provider that keeps failing (e.g. Jina 402) instead of
+            # paying its latency on every task.
+            self.open_until = time.monotonic() + settings.SEARCH_COOLDOWN
+            self.consecutive_failures = 0
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.open_until
+
+    def quantile(self, q: float, default: float) -> float:
+        if len(self.latencies) < 5:
+            return default
+        ordered = sorted(self.latencies)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def score(self) -> float:
+        # Expected time to a good answer: median latency inflated by the error rate.
+        return self.quantile(0.5, 1.0) / max(1.0 - self.error_rate, 0.05)
+
+
+def _from_brave(response: BraveSearchResponse) -> SearchResponse:
+    results = [
+        SearchResult(title=r.title, description=r.description, url=r.url, content="", usage={"tokens": 0})
+        for r in response.web.get("results", [])
+    ]
+    return SearchResponse(code=200, status=20000, data=results)
+
+
+async def _search_jina(query: str, tracker: Optional[TokenTracker]) -> Tuple[SearchResponse, int]:
+    return await JinaSearch.search(query, tracker)
+
+
+async def _search_brave(query: str, tracker: Optional[TokenTracker]) -> Tuple[SearchResponse, int]:
+    response, tokens = await BraveSearch.search(query, tracker)
+    return _from_brave(response), tokens
+
+
+ProviderFn = Callable[[str, Optional[TokenTracker]], Awaitable[Tuple[SearchResponse, int]]]
+
+
+def _normalize_url(url: str) -> str:
+    url = url.split("#", 1)[0].rstrip("/")
+    for prefix in ("https://", "http://"):
+        if url.startswith(prefix):
+            url = url[len(prefix):]
+    return url[4:] if url.startswith("www.") else url
+
+
+class SearchRouter:
+    """Routes a search across Jina and Brave.
+
+    Modes: "race" runs every provider and keeps the first good response, "hedge"
+    starts the next provider only once the current one passes its p90 latency,
+    "merge" unions all results, and "auto" hedges in the order given by live
+    latency and error stats, skipping providers that keep failing. Losing calls
+    are cancelled.
+    """
+
+    providers: Dict[str, ProviderFn] = {"jina": _search_jina, "brave": _search_brave}
+    stats: Dict[str, ProviderStats] = {name: ProviderStats() for name in providers}
+
+    @staticmethod
+    def configured() -> List[str]:
+        keys = {"jina": settings.JINA_API_KEY, "brave": settings.BRAVE_API_KEY}
+        return [name for name in SearchRouter.providers if keys.get(name)]
+
+    @staticmethod
+    def ranked() -> List[str]:
+        names = SearchRouter.configured()
+        available = [name for name in names if SearchRouter.stats[name].available] or names
+        return sorted(available, key=lambda name: SearchRouter.stats[name].score())
+
+    @staticmethod
+    async def _call(name: str, query: str, tracker: Optional[TokenTracker]) -> Tuple[SearchResponse, int]:
+        stats = SearchRouter.stats[name]
+        start = time.perf_counter()
+        try:
+            response, tokens = await SearchRouter.providers[name](query, tracker)
+            if not response.data:
+                raise ValueError(f"Empty results from {name}")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            stats.record_failure()
+            raise
+        stats.record_success(time.perf_counter() - start)
+        return response, tokens
+
+    @staticmethod
+    async def _first_good(names: List[str], query: str, tracker: Optional[TokenTracker],
+                          hedge: bool) -> Tuple[SearchResponse, int]:
+        pending: Dict[asyncio.Task, str] = {}
+        queue = list(names)
+        errors: List[str] = []
+
+        def launch() -> None:
+            name = queue.pop(0)
+            if pending or errors:
+                UPSTREAM_RETRIES.labels(f"{name}-search").inc()
+            pending[asyncio.create_task(SearchRouter._call(name, query, tracker))] = name
+
+        try:
+            launch()
+            while not hedge and queue:
+                launch()
+            while pending:
+                timeout = None
+                if queue:
+                    latest = SearchRouter.stats[list(pending.values())[-1]]
+                    timeout = latest.quantile(0.9, settings.SEARCH_HEDGE_DELAY)
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch()
+                    continue
+                for task in done:
+                    name = pending.pop(task)
+                    if task.exception() is None:
+                        current_span().set(provider=name)
+                        return task.result()
+                    errors.append(f"{name}: {task.exception()}")
+                if not pending and queue:
+                    launch()
+            raise ValueError(f"All search providers failed: {'; '.join(errors)}")
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @staticmethod
+    async def _merge(names: List[str], query: str, tracker: Optional[TokenTracker]) -> Tuple[SearchResponse, int]:
+        results = await asyncio.gather(*(SearchRouter._call(name, query, tracker) for name in names),
+                                       return_exceptions=True)
+        merged: Dict[str, SearchResult] = {}
+        tokens = 0
+        errors: List[str] = []
+        for name, result in zip(names, results):
+            if isinstance(result, BaseException):
+                errors.append(f"{name}: {result}")
+                continue
+            response, used = result
+            tokens += used
+            for item in response.data:
+                key = _normalize_url(item.url)
+                # Prefer the copy that carries page content.
+                if key not in merged or (item.content and not merged[key].content):
+                    merged[key] = item
+        if not merged:
+            raise ValueError(f"All search providers failed: {'; '.join(errors)}")
+        return SearchResponse(code=200, status=20000, data=list(merged.values())), tokens
+
+    @staticmethod
+    @instrument_tool("search-router")
+    async def search(query: str, tracker: Optional[TokenTracker] = None,
+                     mode: Optional[str] = None) -> Tuple[SearchResponse, int]:
+        mode = mode or settings.SEARCH_ROUTER_MODE
+        names = SearchRouter.ranked() if mode == "auto" else SearchRouter.configured()
+        if not names:
+            raise ValueError("No search provider configured")
+        current_span().set(mode=mode, order=",".join(names))
+
+        if mode == "merge":
+            response, tokens = await SearchRouter._merge(names, query, tracker)
+        elif mode == "race":
+            response, tokens = await SearchRouter._first_good(names, query, tracker, hedge=False)
+        elif mode in ("hedge", "auto"):
+            response, tokens = await SearchRouter._first_good(names, query, tracker, hedge=True)
+        else:
+            raise ValueError(f"Unknown search router mode: {mode}")
+
+        logging.info("Search router: %s", {
+            "query": query,
+            "mode": mode,
+            "order": names,
+            "results": len(response.data or [])
+        })
+        return response, tokens
@@ -1,6 +1,6 @@
 from enum import Enum
 from typing import List, Optional, Dict, Any, Union, Literal
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 class ActionType(str, Enum):
     SEARCH = "search"
@@ -65,6 +65,7 @@ class BraveSearchResponse(BaseModel):
 class DedupResponse(BaseModel):
     think: str
     unique_queries: List[str]
+    confidence: Optional[float] = None
 
 class ReadResponse(BaseModel):
     code: int
@@ -73,10 +74,52 @@ class ReadResponse(BaseModel):
     name: Optional[str] = None
     message: Optional[str] = None
     readableMessage: Optional[str] = None
+    # Set when a byte/token cap cut the page short; data.content is partial.
+    truncated: bool = False
+
+class ReadOptions(BaseModel):
+    # Frozen so identical reads share one in-flight request.
+    model_config = ConfigDict(frozen=True)
+
+    max_bytes: Optional[int] = None
+    max_tokens: Optional[int] = None
+    target_selector: Optional[str] = None
+    remove_selector: Optional[str] = None
+    wait_for_selector: Optional[str] = None
+    token_budget: Optional[int] = None
+
+class ContentChunk(BaseModel):
+    text: str
+    score: float
+
+class ProcessedContent(BaseModel):
+    url: str
+    content: str
+    chunks: List[ContentChunk]
+    fingerprint: int
+
+class SpeculativeResult(BaseModel):
+    gap: str
+    search: Optional[SearchResponse] = None
+    reads: List[ReadResponse] = []
+    # Cleaned, chunked and scored against the gap, one per read.
+    pages: List[ProcessedContent] = []
 
 class EvaluationResponse(BaseModel):
     is_definitive: bool
     reasoning: str
+    confidence: Optional[float] = None
+
+class CachedAnswer(BaseModel):
+    question: str
+    answer: str
+    references: List[Reference] = []
+    fingerprint: int
+    created: float
+    ttl: float
+
+class DiaryDigestResponse(BaseModel):
+    digest: str
 
 class ErrorAnalysisResponse(BaseModel):
     recap: str
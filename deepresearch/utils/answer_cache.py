@@ -0,0 +1,135 @@
+import logging
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional, Set, Tuple
+
+from ..config import settings
+from ..types import CachedAnswer, Reference
+from ..tools.content_processor import simhash, hamming_distance
+from .metrics import record_cache
+from .tracer import current_span
+from .lazy import lazy
+
+# Words plus arithmetic operators, so "2+2" and "2*2" stay different questions.
+_TOKEN_RE = re.compile(r"\w+|[-+*/=<>%^]", re.UNICODE)
+# Words two questions may differ by and still share an answer: articles and
+# politeness only. Negations, numbers, tense and question words are never here,
+# since any of them can change the answer.
+STOPWORDS = frozenset((
+    "a", "an", "the", "of", "please", "kindly", "can", "could", "would", "you",
+    "tell", "me", "i", "want", "to", "know", "do", "does", "s", "hi", "hey", "thanks"
+))
+# Questions about the present go stale quickly and get the short TTL.
+_TIME_SENSITIVE_RE = re.compile(
+    r"\b(latest|newest|recent|recently|current|currently|today|tonight|yesterday|now|this (?:week|month|year)"
+    r"|news|price|stock|weather|score|20\d\d)\b"
+)
+
+
+def normalize_question(question: str) -> str:
+    text = unicodedata.normalize("NFKC", question).lower()
+    return " ".join(_TOKEN_RE.findall(text))
+
+
+def _words(normalized: str) -> Set[str]:
+    return set(normalized.split())
+
+
+def _content(normalized: str) -> Tuple[str, ...]:
+    # Order matters: "Java faster than Python" is not "Python faster than Java".
+    return tuple(word for word in normalized.split() if word not in STOPWORDS)
+
+
+def question_ttl(normalized: str) -> float:
+    if _TIME_SENSITIVE_RE.search(normalized):
+        return settings.ANSWER_CACHE_FRESH_TTL
+    return settings.ANSWER_CACHE_TTL
+
+
+class AnswerCache:
+    """Final answers keyed by normalized question, with near-duplicate lookup.
+
+    A lookup first tries the exact normalized question. Otherwise it scans for an
+    entry whose word-level simhash is within `max_distance` bits, whose word sets
+    overlap by at least `min_similarity` (Jaccard), and whose words are the same in
+    the same order once STOPWORDS are removed. On a question this short the simhash
+    and Jaccard are only cheap prefilters. The ordered check is what keeps "capital
+    of France" from matching "capital of Germany", and "Brazil beat Germany" from
+    matching "Germany beat Brazil", at any question length. Entries expire after
+    a TTL that is shorter for time-sensitive questions, and the least recently
+    used entry is evicted at `max_size`.
+    """
+
+    def __init__(self, max_size: int = 1000, max_distance: int = 16, min_similarity: float = 0.8):
+        self.max_size = max_size
+        self.max_distance = max_distance
+        self.min_similarity = min_similarity
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+
+    def _expired(self, entry: CachedAnswer, now: float) -> bool:
+        return now - entry.created > entry.ttl
+
+    def _find(self, key: str) -> Optional[CachedAnswer]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry
+        fingerprint = simhash(key, shingle=1)
+        words = _words(key)
+        content = _content(key)
+        best, best_similarity = None, 0.0
+        for candidate in self._entries.values():
+            if hamming_distance(fingerprint, candidate.fingerprint) > self.max_distance:
+                continue
+            other = _words(candidate.question)
+            similarity = len(words & other) / max(len(words | other), 1)
+            if similarity < self.min_similarity or similarity <= best_similarity:
+                continue
+            # One changed or swapped entity, number or negation means a different
+            # question, however much of the rest overlaps.
+            if _content(candidate.question) != content:
+                continue
+            best, best_similarity = candidate, similarity
+        return best
+
+    def get(self, question: str) -> Optional[CachedAnswer]:
+        key = normalize_question(question)
+        now = time.time()
+        entry = self._find(key) if key else None
+        if entry is not None and self._expired(entry, now):
+            del self._entries[entry.question]
+            entry = None
+        record_cache("answer", entry is not None)
+        current_span().set(answer_cache="hit" if entry else "miss")
+        if entry is None:
+            return None
+        self._entries.move_to_end(entry.question)
+        logging.info("Answer cache hit: %s", {"question": question, "cached": entry.question})
+        return entry
+
+    def put(self, question: str, answer: str, references: Optional[List[Reference]] = None) -> None:
+        key = normalize_question(question)
+        if not key or not answer:
+            return
+        self._entries[key] = CachedAnswer(
+            question=key,
+            answer=answer,
+            references=references or [],
+            fingerprint=simhash(key, shingle=1),
+            created=time.time(),
+            ttl=question_ttl(key)
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+answer_cache = lazy(lambda: AnswerCache(
+    max_size=settings.ANSWER_CACHE_SIZE,
+    max_distance=settings.ANSWER_CACHE_MAX_DISTANCE,
+    min_similarity=settings.ANSWER_CACHE_MIN_SIMILARITY
+))
@@ -0,0 +1,136 @@
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from ..config import settings
+from ..types import ActionType
+from .metrics import registry, Counter
+from .token_tracker import TokenTracker
+from .tracer import current_span
+
+BEAST_MODE: Counter = registry.register(Counter(
+    "deepresearch_beast_mode", "Tasks switched to answer-only mode by the budget planner."
+))
+
+# Starting estimates (tokens) before any step of that kind has been observed.
+DEFAULT_ACTION_COSTS: Dict[str, float] = {
+    ActionType.SEARCH.value: 3000,
+    ActionType.VISIT.value: 10000,
+    ActionType.REFLECT.value: 2000,
+    ActionType.ANSWER.value: 4000,
+}
+
+
+class CostEstimate:
+    __slots__ = ("mean", "samples")
+
+    def __init__(self, prior: float):
+        self.mean = prior
+        self.samples = 0
+
+    def observe(self, tokens: int) -> None:
+        self.samples += 1
+        # The prior counts as one sample; afterwards recent steps weigh the most.
+        alpha = 0.3 if self.samples > 3 else 1.0 / (self.samples + 1)
+        self.mean += alpha * (tokens - self.mean)
+
+
+class BudgetPlanner:
+    """Plans how a task spends its token budget across actions.
+
+    Every step runs inside step(action), which attributes the tokens the task's
+    TokenTracker recorded meanwhile to that action type and to each tool that
+    was used. From those moving averages the planner forecasts how many more
+    steps the remaining budget allows, after holding back enough for a final
+    answer, and caps what a single step may spend at `max_step_fraction` of what
+    is left. Once the forecast drops below `beast_mode_steps`, the task enters
+    beast mode: only "answer" stays allowed. The switch happens while enough
+    budget remains to answer, not after the budget is already gone.
+    """
+
+    def __init__(self, tracker: TokenTracker, max_step_fraction: Optional[float] = None,
+                 beast_mode_steps: Optional[float] = None, answer_margin: Optional[float] = None):
+        self.tracker = tracker
+        self.max_step_fraction = max_step_fraction or settings.PLANNER_MAX_STEP_FRACTION
+        self.beast_mode_steps = beast_mode_steps if beast_mode_steps is not None else settings.PLANNER_BEAST_MODE_STEPS
+        self.answer_margin = answer_margin or settings.PLANNER_ANSWER_MARGIN
+        self.actions: Dict[str, CostEstimate] = {
+            action: CostEstimate(prior) for action, prior in DEFAULT_ACTION_COSTS.items()
+        }
+        self.tools: Dict[str, CostEstimate] = {}
+        self.steps = 0
+        self.beast_mode = False
+
+    def remaining(self) -> Optional[int]:
+        return self.tracker.get_remaining()
+
+    def answer_reserve(self) -> int:
+        return int(self.actions[ActionType.ANSWER.value].mean * self.answer_margin)
+
+    def step_cost(self) -> float:
+        # Average cost of an exploratory step, weighted equally across actions.
+        exploratory = [estimate.mean for action, estimate in self.actions.items() if action != ActionType.ANSWER.value]
+        return sum(exploratory) / len(exploratory)
+
+    def forecast_steps(self) -> Optional[float]:
+        remaining = self.remaining()
+        if remaining is None:
+            return None
+        return max(remaining - self.answer_reserve(), 0) / max(self.step_cost(), 1.0)
+
+    def step_cap(self, action: str = ActionType.SEARCH.value) -> Optional[int]:
+        remaining = self.remaining()
+        if remaining is None:
+            return None
+        if action == ActionType.ANSWER.value:
+            return max(remaining, 0)
+        return max(min(int(remaining * self.max_step_fraction), remaining - self.answer_reserve()), 0)
+
+    def _update_mode(self) -> None:
+        forecast = self.forecast_steps()
+        if not self.beast_mode and forecast is not None and forecast < self.beast_mode_steps:
+            self.beast_mode = True
+            BEAST_MODE.inc()
+            logging.info("Budget planner: %s", {"beast_mode": True, "forecast_steps": round(forecast, 2),
+                                                 "remaining": self.remaining()})
+
+    def allowed_actions(self) -> List[str]:
+        self._update_mode()
+        if self.beast_mode:
+            return [ActionType.ANSWER.value]
+        cap = self.step_cap()
+        return [
+            action for action, estimate in self.actions.items()
+            if action == ActionType.ANSWER.value or cap is None or estimate.mean <= cap
+        ]
+
+    def allows(self, action: str) -> bool:
+        return action in self.allowed_actions()
+
+    @contextmanager
+    def step(self, action: str) -> Iterator[None]:
+        start_total = self.tracker.get_total_usage()
+        start_tools = self.tracker.get_usage_breakdown()
+        try:
+            yield
+        finally:
+            spent = self.tracker.get_total_usage() - start_total
+            self.actions.setdefault(action, CostEstimate(spent)).observe(spent)
+            for tool, tokens in self.tracker.get_usage_breakdown().items():
+                used = tokens - start_tools.get(tool, 0)
+                if used:
+                    self.tools.setdefault(tool, CostEstimate(used)).observe(used)
+            self.steps += 1
+            self._update_mode()
+            current_span().set(planned_action=action, step_tokens=spent)
+
+    def summary(self) -> Dict[str, Any]:
+        forecast = self.forecast_steps()
+        return {
+            "steps": self.steps,
+            "beastMode": self.beast_mode,
+            "forecastSteps": round(forecast, 2) if forecast is not None else None,
+            "stepCap": self.step_cap(),
+            "actionCosts": {action: round(estimate.mean) for action, estimate in self.actions.items()},
+            "toolCosts": {tool: round(estimate.mean) for tool, estimate in self.tools.items()}
+        }
@@ -0,0 +1,127 @@
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+import httpx
+
+# Only headers that change how the body is read are kept; auth never leaves the process.
+_KEPT_HEADERS = ("content-type",)
+
+
+class CassetteMissError(httpx.TransportError):
+    """Replay found no recorded interaction for a request."""
+
+
+def request_key(method: str, url: httpx.URL, body: bytes) -> str:
+    # JSON bodies are re-serialized with sorted keys so dict ordering can't cause a miss.
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode()
+    except ValueError:
+        pass
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    return f"{method} {url.copy_with(fragment=None)} {digest}"
+
+
+def _encode_body(body: bytes) -> Dict[str, str]:
+    try:
+        return {"text": body.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"base64": base64.b64encode(body).decode()}
+
+
+def _decode_body(entry: Dict[str, Any]) -> bytes:
+    if "base64" in entry:
+        return base64.b64decode(entry["base64"])
+    return entry.get("text", "").encode("utf-8")
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """Records upstream HTTP interactions to a cassette or replays them from one.
+
+    The cassette is gzip-compressed JSON lines, one interaction per line: the
+    request method, URL and body hash, the response status, content type and
+    body, and the time the upstream took. Recording appends each interaction as
+    its own gzip member as soon as it completes, so a crashed run keeps what it
+    had. Replay serves interactions for the same request key in recorded order.
+    It waits `latency_scale` times the recorded latency (0 is as fast as
+    possible) and raises CassetteMissError for requests that were never
+    recorded, so nothing reaches a live service.
+    """
+
+    def __init__(self, path: str, mode: str, inner: Optional[httpx.AsyncBaseTransport] = None,
+                 latency_scale: float = 1.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.inner = inner or httpx.AsyncHTTPTransport()
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._recorded: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        if mode == "replay":
+            for entry in self.load(self.path):
+                self._recorded[entry["key"]].append(entry)
+            logging.info("Cassette loaded: %s", {"path": str(self.path), "interactions": self.interactions()})
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def load(path: Path) -> List[Dict[str, Any]]:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def interactions(self) -> int:
+        return sum(len(entries) for entries in self._recorded.values())
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        line = (json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._lock, open(self.path, "ab") as f:
+            f.write(gzip.compress(line))
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        key = request_key(request.method, request.url, body)
+        if self.mode == "replay":
+            return await self._replay(request, key)
+
+        start = time.perf_counter()
+        response = await self.inner.handle_async_request(request)
+        try:
+            content = await response.aread()
+        finally:
+            await response.aclose()
+        latency = time.perf_counter() - start
+        headers = {name: response.headers[name] for name in _KEPT_HEADERS if name in response.headers}
+        entry = {
+            "key": key,
+            "method": request.method,
+            "url": str(request.url),
+            "status": response.status_code,
+            "headers": headers,
+            "latency": round(latency, 4),
+            "recorded": time.time(),
+            **_encode_body(content)
+        }
+        await asyncio.to_thread(self._append, entry)
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    async def _replay(self, request: httpx.Request, key: str) -> httpx.Response:
+        queue = self._recorded.get(key)
+        if not queue:
+            raise CassetteMissError(f"No recorded interaction for {request.method} {request.url}", request=request)
+        # Keep the last interaction so repeated identical requests still replay.
+        entry = queue.popleft() if len(queue) > 1 else queue[0]
+        if self.latency_scale > 0:
+            await asyncio.sleep(entry["latency"] * self.latency_scale)
+        return httpx.Response(entry["status"], headers=entry["headers"], content=_decode_body(entry), request=request)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
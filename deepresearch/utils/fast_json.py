@@ -0,0 +1,95 @@
+import json
+import typing
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Tuple, Type, TypeVar, Union
+
+from pydantic import BaseModel
+
+from ..config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def loads(raw: Union[bytes, str]) -> Any:
+    # orjson parses the response bytes directly, skipping the bytes -> str copy that
+    # httpx's response.json() makes before the stdlib parser even starts.
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def dumps(obj: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj)
+
+
+def _model_type(annotation: Any) -> Any:
+    # Unwrap Optional[...] so nested models can be built without validation.
+    if typing.get_origin(annotation) is Union:
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return annotation
+
+
+def _builder(annotation: Any) -> Optional[Callable[[Any], Any]]:
+    # Returns None for leaf values, which are kept as the parser produced them.
+    annotation = _model_type(annotation)
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return lambda value: construct(annotation, value) if isinstance(value, dict) else value
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin is list and args:
+        item = _builder(args[0])
+        if item is not None:
+            return lambda value: [item(v) for v in value] if isinstance(value, list) else value
+    if origin is dict and len(args) == 2:
+        item = _builder(args[1])
+        if item is not None:
+            return lambda value: {k: item(v) for k, v in value.items()} if isinstance(value, dict) else value
+    return None
+
+
+@lru_cache(maxsize=None)
+def _plan(model: Type[BaseModel]) -> Tuple[Tuple[str, ...], Tuple[Tuple[str, Optional[Callable[[Any], Any]]], ...]]:
+    fields = model.model_fields
+    required = tuple(name for name, field in fields.items() if field.is_required())
+    return required, tuple((name, _builder(field.annotation)) for name, field in fields.items())
+
+
+def construct(model: Type[M], data: Dict[str, Any]) -> M:
+    """Shallow-validated model for a trusted upstream payload.
+
+    Only the model's declared fields are copied, nested models are built the same
+    way, and strings are kept as the objects the parser produced instead of being
+    re-validated. If a required field is missing the payload is not the shape we
+    trust, so it falls back to full validation to raise the usual error.
+    """
+    required, fields = _plan(model)
+    if any(name not in data for name in required):
+        return model.model_validate(data)
+    values = {}
+    for name, build in fields:
+        if name in data:
+            value = data[name]
+            values[name] = value if build is None else build(value)
+    return model.model_construct(**values)
+
+
+def decode(model: Type[M], raw: Union[bytes, str]) -> M:
+    # Shallow decoding only pays off on top of orjson; after the stdlib parser,
+    # pydantic parsing and validating the raw bytes in one pass is faster.
+    if orjson is None:
+        return model.model_validate_json(raw)
+    data = loads(raw)
+    if not isinstance(data, dict):
+        return model.model_validate(data)
+    if settings.FAST_DECODE:
+        return construct(model, data)
+    return model.model_validate(data)
@@ -0,0 +1,40 @@
+from typing import Optional
+
+import httpx
+
+from ..config import settings
+from .cassette import CassetteTransport
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def create_transport() -> httpx.AsyncBaseTransport:
+    transport = httpx.AsyncHTTPTransport()
+    if settings.CASSETTE_MODE == "off":
+        return transport
+    return CassetteTransport(
+        settings.CASSETTE_PATH,
+        settings.CASSETTE_MODE,
+        inner=transport,
+        latency_scale=settings.CASSETTE_LATENCY_SCALE
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared HTTP client for Jina, Brave and OpenAI calls.
+
+    One connection pool is reused across requests, and record/replay
+    (CASSETTE_MODE) plugs in here as the transport, so every upstream call made by
+    the tools and the Agent goes through it.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(transport=create_transport())
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
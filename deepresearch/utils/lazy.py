@@ -0,0 +1,47 @@
+import threading
+from typing import Any, Callable, Generic, TypeVar, cast
+
+T = TypeVar("T")
+
+
+class Lazy(Generic[T]):
+    """Module-level singleton that is built on first attribute access.
+
+    Lets modules keep `from .x import thing` style singletons without reading
+    settings, opening files or building clients at import time. Use resolve()
+    for the real object (e.g. for isinstance) and is_built() to skip cleanup of
+    something that was never used.
+    """
+
+    __slots__ = ("_factory", "_instance", "_lock")
+
+    def __init__(self, factory: Callable[[], T]):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(resolve(self), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(resolve(self), name, value)
+
+
+def resolve(proxy: "Lazy[T]") -> T:
+    instance = object.__getattribute__(proxy, "_instance")
+    if instance is None:
+        with object.__getattribute__(proxy, "_lock"):
+            instance = object.__getattribute__(proxy, "_instance")
+            if instance is None:
+                instance = object.__getattribute__(proxy, "_factory")()
+                object.__setattr__(proxy, "_instance", instance)
+    return cast(T, instance)
+
+
+def is_built(proxy: "Lazy[Any]") -> bool:
+    return object.__getattribute__(proxy, "_instance") is not None
+
+
+def lazy(factory: Callable[[], T]) -> T:
+    # Typed as the wrapped object so call sites keep their attribute types.
+    return cast(T, Lazy(factory))
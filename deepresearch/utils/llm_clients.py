@@ -0,0 +1,39 @@
+import threading
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from ..config import settings, modelEndpoints
+from .http_client import get_http_client
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+_clients: Dict[Tuple[str, str], "AsyncOpenAI"] = {}
+_lock = threading.Lock()
+
+
+def get_llm_client(model: Optional[str] = None) -> "AsyncOpenAI":
+    """Shared AsyncOpenAI client for the endpoint that serves `model`.
+
+    Clients are built on first use, one per base URL (modelEndpoints, then
+    OPENAI_BASE_URL, then the OpenAI default), and all of them send through the
+    shared HTTP client. Tools and Agent instances therefore share one connection
+    pool instead of each holding its own.
+    """
+    base_url = modelEndpoints.get(model or "") or settings.OPENAI_BASE_URL or None
+    key = (base_url or "", settings.OPENAI_API_KEY)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                # Imported here: the openai package is most of the app's import time.
+                from openai import AsyncOpenAI
+                client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=base_url,
+                                     http_client=get_http_client())
+                _clients[key] = client
+    return client
+
+
+def reset_llm_clients() -> None:
+    # Called when the shared HTTP client is closed, since every client wraps it.
+    _clients.clear()
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from .metrics import LOOP_BLOCKS, LOOP_LAG, LOOP_LAG_LAST
+
+
+class LoopMonitor:
+    """Samples event loop lag and, in debug mode, reports callbacks that block the loop.
+
+    The lag sampler is a coroutine that sleeps for `interval` and records how late it
+    woke up; it costs one timer per interval and is meant to stay on in production.
+
+    The blocking detector is a watchdog thread that pings the loop with
+    `call_soon_threadsafe`. If a ping is not serviced within `block_threshold`, the
+    loop thread's current stack is captured and logged, which points at the
+    synchronous code that is holding the loop.
+    """
+
+    def __init__(self, interval: float = 0.5, debug: bool = False, block_threshold: float = 0.1):
+        self.interval = interval
+        self.debug = debug
+        self.block_threshold = block_threshold
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sampler: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopped.clear()
+        self._sampler = asyncio.create_task(self._sample())
+        if self.debug:
+            self._watchdog = threading.Thread(
+                target=self._watch, args=(threading.get_ident(),), name="loop-watchdog", daemon=True
+            )
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._sampler:
+            self._sampler.cancel()
+            try:
+                await self._sampler
+            except asyncio.CancelledError:
+                pass
+            self._sampler = None
+        if self._watchdog:
+            await asyncio.to_thread(self._watchdog.join, 1.0)
+            self._watchdog = None
+
+    async def _sample(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - start - self.interval, 0.0)
+            LOOP_LAG.observe(lag)
+            LOOP_LAG_LAST.set(lag)
+
+    def _watch(self, loop_thread_id: int) -> None:
+        while not self._stopped.is_set():
+            serviced = threading.Event()
+            try:
+                self._loop.call_soon_threadsafe(serviced.set)
+            except RuntimeError:
+                return  # loop closed
+            if serviced.wait(self.block_threshold):
+                self._stopped.wait(self.block_threshold)
+                continue
+
+            blocked_since = time.perf_counter() - self.block_threshold
+            frame = sys._current_frames().get(loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "<no frame>"
+            serviced.wait()
+            LOOP_BLOCKS.inc()
+            logging.warning(
+                "Event loop blocked for %.1f ms (threshold %.0f ms). Loop thread stack:\n%s",
+                (time.perf_counter() - blocked_since) * 1000, self.block_threshold * 1000, stack
+            )
@@ -0,0 +1,275 @@
+import bisect
+import functools
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+from .tracer import tracer
+
+# All updates happen on the event loop thread, so the hot path is a dict lookup
+# plus a float add; no locks are taken when recording.
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric(ABC):
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+
+    def labels(self, *values: str) -> Any:
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            child = self._new_child()
+            self._children[values] = child
+        return child
+
+    @abstractmethod
+    def _new_child(self) -> Any: ...
+
+    @abstractmethod
+    def _samples(self) -> List[str]: ...
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}_total{_format_labels(self.labelnames, key)} {child.value}"
+            for key, child in self._children.items()
+        ]
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {child.value}"
+            for key, child in self._children.items()
+        ]
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _samples(self) -> List[str]:
+        lines: List[str] = []
+        for key, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {child.sum}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        # Collectors refresh sampled gauges right before a scrape.
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+TOOL_LATENCY: Histogram = registry.register(Histogram(
+    "deepresearch_tool_duration_seconds", "Wall time of a tool call, including parsing.", ["tool"]
+))
+UPSTREAM_LATENCY: Histogram = registry.register(Histogram(
+    "deepresearch_upstream_duration_seconds", "Wall time of a single upstream request.", ["upstream"]
+))
+TOOL_TOKENS: Counter = registry.register(Counter(
+    "deepresearch_tool_tokens", "Tokens recorded by TokenTracker, per tool.", ["tool"]
+))
+TASKS_IN_FLIGHT: Gauge = registry.register(Gauge(
+    "deepresearch_tasks_in_flight", "Research tasks currently running."
+))
+SSE_SUBSCRIBERS: Gauge = registry.register(Gauge(
+    "deepresearch_sse_subscribers", "Open SSE stream connections."
+))
+QUEUE_DEPTH: Gauge = registry.register(Gauge(
+    "deepresearch_queue_depth", "Items waiting in an internal queue.", ["queue"]
+))
+UPSTREAM_RETRIES: Counter = registry.register(Counter(
+    "deepresearch_upstream_retries", "Retried upstream requests.", ["upstream"]
+))
+UPSTREAM_ERRORS: Counter = registry.register(Counter(
+    "deepresearch_upstream_errors", "Failed upstream requests.", ["upstream"]
+))
+CACHE_REQUESTS: Counter = registry.register(Counter(
+    "deepresearch_cache_requests", "Cache lookups by result.", ["cache", "result"]
+))
+CACHE_HIT_RATIO: Gauge = registry.register(Gauge(
+    "deepresearch_cache_hit_ratio", "Fraction of cache lookups that hit.", ["cache"]
+))
+LOOP_LAG: Histogram = registry.register(Histogram(
+    "deepresearch_event_loop_lag_seconds", "Delay between a scheduled loop wakeup and when it ran.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+))
+LOOP_LAG_LAST: Gauge = registry.register(Gauge(
+    "deepresearch_event_loop_lag_last_seconds", "Most recent event loop lag sample."
+))
+LOOP_BLOCKS: Counter = registry.register(Counter(
+    "deepresearch_event_loop_blocks", "Callbacks that blocked the loop past the debug threshold."
+))
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    hits = CACHE_REQUESTS.labels(cache, "hit")
+    misses = CACHE_REQUESTS.labels(cache, "miss")
+    (hits if hit else misses).inc()
+    CACHE_HIT_RATIO.labels(cache).set(hits.value / (hits.value + misses.value))
+
+
+@contextmanager
+def track_upstream(upstream: str) -> Iterator[Any]:
+    """Times one upstream request and counts it as an error if the block raises.
+
+    httpx does not raise on 4xx/5xx, so callers check the status and payload
+    inside the block; a failure raised after it exits is not counted.
+    """
+    latency = UPSTREAM_LATENCY.labels(upstream)
+    start = time.perf_counter()
+    try:
+        with tracer.span(f"upstream:{upstream}") as span:
+            yield span
+    except Exception:
+        UPSTREAM_ERRORS.labels(upstream).inc()
+        raise
+    finally:
+        latency.observe(time.perf_counter() - start)
+
+
+def instrument_tool(tool: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        latency = TOOL_LATENCY.labels(tool)
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                with tracer.span(f"tool:{tool}"):
+                    return await func(*args, **kwargs)
+            finally:
+                latency.observe(time.perf_counter() - start)
+
+        return wrapper
+    return decorator
+
+
+def render_metrics() -> str:
+    return registry.render()
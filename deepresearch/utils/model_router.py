@@ -0,0 +1,212 @@
+import json
+import logging
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from ..config import modelConfigs, modelPrices
+from .metrics import registry, Counter, Gauge, Histogram, track_upstream
+from .tracer import current_span
+from .timeouts import stage_timeout
+from .token_tracker import TokenTracker
+from .singleflight import inflight
+from .llm_clients import get_llm_client
+
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletion
+
+MODEL_CALLS: Counter = registry.register(Counter(
+    "deepresearch_model_calls", "Tool LLM calls by cascade outcome.", ["tool", "model", "outcome"]
+))
+MODEL_COST: Counter = registry.register(Counter(
+    "deepresearch_model_cost_usd", "Estimated LLM spend in USD.", ["tool", "model"]
+))
+MODEL_LATENCY: Histogram = registry.register(Histogram(
+    "deepresearch_model_duration_seconds", "Latency of a single cascade stage.", ["tool", "model"]
+))
+MODEL_THRESHOLD: Gauge = registry.register(Gauge(
+    "deepresearch_model_confidence_threshold", "Current cascade escalation threshold.", ["tool"]
+))
+
+M = TypeVar("M", bound=BaseModel)
+
+# Errors that mean the structured output can't be used and a stronger model should try.
+INVALID_OUTPUT = (json.JSONDecodeError, AttributeError, KeyError, TypeError, ValidationError)
+
+
+class ModelStats:
+    __slots__ = ("calls", "latency", "cost")
+
+    def __init__(self):
+        self.calls = 0
+        self.latency = 0.0
+        self.cost = 0.0
+
+    def record(self, latency: float, cost: float) -> None:
+        self.calls += 1
+        # Exponential moving averages keep the stats cheap and biased to recent traffic.
+        alpha = 0.1 if self.calls > 10 else 1.0 / self.calls
+        self.latency += alpha * (latency - self.latency)
+        self.cost += alpha * (cost - self.cost)
+
+
+def escalation_weight(cheap: ModelStats, strong: ModelStats, low: float = 0.5, high: float = 3.0) -> float:
+    # How much dearer the stronger stage is than the cheap one, averaged over cost
+    # and latency and damped with a square root; 1.0 until both have been measured.
+    ratios = [
+        getattr(strong, field) / getattr(cheap, field)
+        for field in ("cost", "latency")
+        if getattr(cheap, field) > 0 and getattr(strong, field) > 0
+    ]
+    if not ratios:
+        return 1.0
+    return min(max((sum(ratios) / len(ratios)) ** 0.5, low), high)
+
+
+def spent_tokens(error: BaseException) -> int:
+    # Tokens a failed cascade had already used, set by ModelRouter.complete.
+    return getattr(error, "spent_tokens", 0)
+
+
+def estimate_cost(model: str, response: "ChatCompletion") -> float:
+    prices = modelPrices.get(model)
+    if not prices or not response.usage:
+        return 0.0
+    return (response.usage.prompt_tokens * prices["input"]
+            + response.usage.completion_tokens * prices["output"]) / 1_000_000
+
+
+class ModelRouter:
+    """Tries each tool's model cascade from cheapest to strongest.
+
+    A stage's output is accepted when it parses and, if it reports a confidence,
+    that confidence reaches the tool's threshold. Otherwise the next model is
+    tried. When a low-confidence answer is escalated, the threshold drifts down
+    if the stronger model agrees with it (the escalation was wasted) and up if
+    it disagrees. The step is scaled by how much dearer the stronger stage is,
+    from per-model moving averages of cost and latency: expensive escalations
+    that turn out wasted lower the threshold faster, and raise it more slowly
+    when they were needed.
+    """
+
+    def __init__(self, step: float = 0.02, floor: float = 0.3, ceiling: float = 0.95):
+        self.step = step
+        self.floor = floor
+        self.ceiling = ceiling
+        self.thresholds: Dict[str, float] = {
+            tool: config.get("minConfidence", 0.0) for tool, config in modelConfigs.items()
+        }
+        self.stats: Dict[Tuple[str, str], ModelStats] = {}
+
+    def _adapt(self, tool: str, agreed: bool, weight: float = 1.0) -> None:
+        delta = -self.step * weight if agreed else self.step / weight
+        self.thresholds[tool] = min(max(self.thresholds[tool] + delta, self.floor), self.ceiling)
+        MODEL_THRESHOLD.labels(tool).set(self.thresholds[tool])
+
+    async def complete(
+        self,
+        tool: str,
+        create: Callable[[str], Awaitable["ChatCompletion"]],
+        parse: Callable[["ChatCompletion"], Any]
+    ) -> Tuple[Any, int]:
+        config = modelConfigs[tool]
+        models = config.get("cascade") or [config["model"]]
+        tokens = 0
+        low_confidence: Optional[Any] = None
+        low_stats: Optional[ModelStats] = None
+
+        try:
+            for index, model in enumerate(models):
+                last = index == len(models) - 1
+                stats = self.stats.setdefault((tool, model), ModelStats())
+                start = time.perf_counter()
+                with track_upstream("openai"):
+                    async with stage_timeout("llm"):
+                        response = await create(model)
+                latency = time.perf_counter() - start
+                cost = estimate_cost(model, response)
+                tokens += response.usage.total_tokens if response.usage else 0
+                MODEL_LATENCY.labels(tool, model).observe(latency)
+                MODEL_COST.labels(tool, model).inc(cost)
+
+                try:
+                    result = parse(response)
+                except INVALID_OUTPUT as e:
+                    stats.record(latency, cost)
+                    if last:
+                        MODEL_CALLS.labels(tool, model, "invalid").inc()
+                        raise
+                    MODEL_CALLS.labels(tool, model, "escalated").inc()
+                    logging.info("Model cascade: %s", {"tool": tool, "model": model, "escalate": "invalid output", "error": str(e)})
+                    continue
+
+                confidence = getattr(result, "confidence", None)
+                if not last and confidence is not None and confidence < self.thresholds[tool]:
+                    stats.record(latency, cost)
+                    MODEL_CALLS.labels(tool, model, "escalated").inc()
+                    logging.info("Model cascade: %s", {"tool": tool, "model": model, "escalate": "low confidence", "confidence": confidence})
+                    low_confidence, low_stats = result, stats
+                    continue
+
+                stats.record(latency, cost)
+                MODEL_CALLS.labels(tool, model, "accepted").inc()
+                if low_confidence is not None:
+                    self._adapt(tool, agreed=_same_verdict(low_confidence, result),
+                                weight=escalation_weight(low_stats, stats))
+                current_span().set(model=model, cascade_stage=index)
+                return result, tokens
+        except Exception as e:
+            # Earlier stages were paid for even when a later one fails or times out.
+            e.spent_tokens = tokens
+            raise
+        raise RuntimeError(f"Empty model cascade for {tool}")
+
+    async def call_function(
+        self,
+        tool: str,
+        prompt: str,
+        function: Dict[str, Any],
+        response_model: Type[M],
+        tracker: Optional[TokenTracker] = None,
+        label: Optional[str] = None
+    ) -> Tuple[M, int]:
+        """Sends one function-calling prompt through the tool's cascade.
+
+        Identical prompts in flight share one call. `tracker` is charged under
+        `label` (default: the tool name) for the tokens used, including those of a
+        cascade that failed part way.
+        """
+        label = label or tool
+
+        def create(model: str) -> Awaitable["ChatCompletion"]:
+            return get_llm_client(model).chat.completions.create(
+                model=model,
+                temperature=modelConfigs[tool]["temperature"],
+                functions=[function],
+                messages=[{"role": "user", "content": prompt}]
+            )
+
+        def parse(response: "ChatCompletion") -> M:
+            return response_model(**json.loads(response.choices[0].message.function_call.arguments))
+
+        try:
+            result, tokens = await inflight.do((label, prompt), lambda: self.complete(tool, create, parse))
+        except Exception as e:
+            if tracker:
+                await tracker.track_usage(label, spent_tokens(e))
+            raise
+        if tracker:
+            await tracker.track_usage(label, tokens)
+        return result, tokens
+
+
+def _same_verdict(a: Any, b: Any) -> bool:
+    # Compare the decision fields only; reasoning text always differs between models.
+    ignore = {"think", "reasoning", "confidence"}
+    left = {k: v for k, v in a.model_dump().items() if k not in ignore}
+    right = {k: v for k, v in b.model_dump().items() if k not in ignore}
+    return left == right
+
+
+model_router = ModelRouter()
@@ -0,0 +1,65 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from .metrics import registry, Counter
+from .tracer import current_span
+
+COALESCED_CALLS: Counter = registry.register(Counter(
+    "deepresearch_coalesced_calls", "Calls served by an identical call already in flight.", ["group"]
+))
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls into one upstream request.
+
+    Keys are tuples whose first element names the call group, e.g.
+    ("read", "https://example.com/page"). Every caller awaits the same shared
+    task through asyncio.shield, so cancelling one caller does not cancel the
+    request; it is cancelled only when its last waiter goes away.
+
+    Token policy: the shared call runs without a TokenTracker. Each caller then
+    charges its own tracker the full token count of the result, because each
+    task consumes the whole result into its own context. Upstream spend that was
+    saved shows up in deepresearch_coalesced_calls_total rather than in any
+    task's budget.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+
+    async def do(self, key: Tuple[Any, ...], fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.create_task(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+        else:
+            COALESCED_CALLS.labels(str(key[0])).inc()
+            current_span().set(coalesced=True)
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                self._forget(key, call)
+                call.task.cancel()
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+inflight = SingleFlight()
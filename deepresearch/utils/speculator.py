@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from ..types import ProcessedContent, ReadOptions, ReadResponse, SpeculativeResult
+from ..tools.read import Reader
+from ..tools.content_processor import ContentProcessor
+from .metrics import registry, Counter
+from .token_tracker import TokenTracker
+from .tracer import tracer
+
+SPECULATIONS: Counter = registry.register(Counter(
+    "deepresearch_speculations", "Speculative follow-up runs by outcome.", ["outcome"]
+))
+
+SearchFn = Callable[[str, Optional[TokenTracker]], Awaitable[Tuple[Any, int]]]
+
+
+def _result_urls(response: Any) -> List[str]:
+    # Jina/router return SearchResponse.data, Brave returns web["results"].
+    data = getattr(response, "data", None)
+    if data is None and getattr(response, "web", None):
+        data = response.web.get("results", [])
+    return [item.url for item in data or []]
+
+
+class Speculator:
+    """Runs likely follow-up searches and reads for open gaps while an answer is evaluated.
+
+    The budget is reserved from the parent up front (at most a quarter of what
+    remains) and split evenly across the gaps. Each gap charges its own child
+    tracker and checks its share before every search and read, so one gap can't
+    starve the others. A single call can still overrun its share; the child records
+    it anyway. commit() waits for the results and merges the children's usage;
+    cancel() stops the work. Tokens already spent are merged in both cases, since
+    they were really spent, and the reservation is released.
+    """
+
+    def __init__(self, search: SearchFn, tracker: TokenTracker, budget: int,
+                 max_gaps: int = 2, max_reads: int = 2):
+        self.search = search
+        self.parent = tracker
+        self.budget = budget
+        self.max_gaps = max_gaps
+        self.max_reads = max_reads
+        self.share = 0
+        # Unbudgeted, so every token really spent is recorded; the shares are the cap.
+        self.children: List[TokenTracker] = []
+        self.tasks: List[asyncio.Task] = []
+        self.reserved = False
+
+    def start(self, gaps: List[str]) -> bool:
+        gaps = gaps[:self.max_gaps]
+        # Never hold more than a quarter of what is left for the main loop.
+        remaining = self.parent.get_remaining()
+        if remaining is not None:
+            self.budget = min(self.budget, remaining // 4)
+        self.share = self.budget // len(gaps) if gaps else 0
+        if self.share <= 0 or not self.parent.reserve(self.budget):
+            return False
+        self.reserved = True
+        self.children = [TokenTracker() for _ in gaps]
+        self.tasks = [asyncio.create_task(self._follow_up(gap, child)) for gap, child in zip(gaps, self.children)]
+        return True
+
+    def _left(self, child: TokenTracker) -> int:
+        # The gap's own share, and never more than what is left of the whole reservation.
+        spent = sum(other.get_total_usage() for other in self.children)
+        return min(self.share - child.get_total_usage(), self.budget - spent)
+
+    async def _follow_up(self, gap: str, child: TokenTracker) -> SpeculativeResult:
+        with tracer.span("speculate", gap=gap):
+            if self._left(child) <= 0:
+                return SpeculativeResult(gap=gap)
+            response, _ = await self.search(gap, child)
+            reads: List[ReadResponse] = []
+            pages: List[ProcessedContent] = []
+            for url in _result_urls(response)[:self.max_reads]:
+                remaining = self._left(child)
+                if remaining <= 0:
+                    break
+                try:
+                    # Cap the page at what is left, so one long page can't overrun the share.
+                    read, _ = await Reader.read_url(url, child, ReadOptions(max_tokens=remaining))
+                    reads.append(read)
+                    pages.append(await ContentProcessor.process(read.data, gap))
+                except Exception as e:
+                    logging.info("Speculative read failed: %s", {"url": url, "error": str(e)})
+            return SpeculativeResult(gap=gap, search=response if hasattr(response, "data") else None,
+                                     reads=reads, pages=pages)
+
+    def _settle(self) -> None:
+        # Release before merging: the child's spend was drawn from the reservation.
+        if self.reserved:
+            self.parent.release(self.budget)
+            self.reserved = False
+        for child in self.children:
+            self.parent.merge(child)
+            child.reset()
+
+    async def commit(self) -> List[SpeculativeResult]:
+        try:
+            outcomes = await asyncio.gather(*self.tasks, return_exceptions=True)
+        except BaseException:
+            await self.cancel()
+            raise
+        self._settle()
+        SPECULATIONS.labels("committed").inc()
+        results = [outcome for outcome in outcomes if isinstance(outcome, SpeculativeResult)]
+        logging.info("Speculation committed: %s", {"gaps": [r.gap for r in results]})
+        return results
+
+    async def cancel(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self._settle()
+        SPECULATIONS.labels("cancelled").inc()
@@ -0,0 +1,360 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config import settings
+from .action_tracker import ActionTracker
+from .token_tracker import TokenTracker
+from .budget_planner import BudgetPlanner
+from .lazy import lazy
+
+
+# Tasks in these states are never purged by the TTL while their owner is alive.
+ACTIVE_STATUSES = ("running", "cancelling")
+# Final answer recorded for a task whose owner stopped renewing its lease.
+LEASE_EXPIRED = "Task owner stopped responding"
+
+
+class TaskExistsError(ValueError):
+    """create_task was called for a request ID that is already registered."""
+
+
+class StateBackend(ABC):
+    """Task status, event log and tracker snapshots shared by every worker.
+
+    The worker that runs a task is the only writer for it; any worker can read, so a
+    stream request does not have to land on the worker that accepted the query.
+    """
+
+    @abstractmethod
+    async def create_task(self, request_id: str, status: str = "running") -> None:
+        """Registers a new task; raises TaskExistsError instead of replacing one."""
+
+    @abstractmethod
+    async def set_status(self, request_id: str, status: str, final_answer: Optional[Any] = None) -> None: ...
+
+    @abstractmethod
+    async def get_status(self, request_id: str) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def append_event(self, request_id: str, event: Dict[str, Any]) -> int: ...
+
+    @abstractmethod
+    async def get_events(self, request_id: str, after: int = 0) -> List[Tuple[int, Dict[str, Any]]]: ...
+
+    @abstractmethod
+    async def save_snapshot(self, request_id: str, snapshot: Dict[str, Any]) -> None: ...
+
+    @abstractmethod
+    async def get_snapshot(self, request_id: str) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def delete_task(self, request_id: str) -> None: ...
+
+    @abstractmethod
+    async def request_cancel(self, request_id: str) -> bool:
+        """Moves a running task to "cancelling"; False if it is not running."""
+
+    @abstractmethod
+    async def update_subscribers(self, request_id: str, delta: int) -> int:
+        """Adjusts the task's stream subscriber count across workers and returns it."""
+
+    async def heartbeat(self, request_ids: List[str]) -> None:
+        """Renews the owner's lease on tasks it is running.
+
+        Backends shared between processes mark an active task as "error" once its
+        lease is older than `lease` seconds, so a task whose worker died does not
+        stay "running" forever. The in-memory backend dies with its owner and
+        needs no lease.
+        """
+
+    async def close(self) -> None:
+        pass
+
+
+class InMemoryStateBackend(StateBackend):
+    def __init__(self, ttl: int = 3600):
+        self.ttl = ttl
+        self._status: Dict[str, Dict[str, Any]] = {}
+        self._events: Dict[str, List[Dict[str, Any]]] = {}
+        self._snapshots: Dict[str, Dict[str, Any]] = {}
+        self._subscribers: Dict[str, int] = {}
+
+    def _purge_expired(self) -> None:
+        cutoff = time.time() - self.ttl
+        expired = [
+            rid for rid, row in self._status.items()
+            if row["updated"] < cutoff and row["status"] not in ACTIVE_STATUSES
+        ]
+        for request_id in expired:
+            self._drop(request_id)
+
+    def _drop(self, request_id: str) -> None:
+        self._status.pop(request_id, None)
+        self._events.pop(request_id, None)
+        self._snapshots.pop(request_id, None)
+        self._subscribers.pop(request_id, None)
+
+    def _touch(self, request_id: str) -> None:
+        row = self._status.get(request_id)
+        if row is not None:
+            row["updated"] = time.time()
+
+    async def create_task(self, request_id: str, status: str = "running") -> None:
+        self._purge_expired()
+        if request_id in self._status:
+            raise TaskExistsError(f"Task {request_id} already exists")
+        self._status[request_id] = {"status": status, "final_answer": None, "updated": time.time()}
+        self._events[request_id] = []
+
+    async def set_status(self, request_id: str, status: str, final_answer: Optional[Any] = None) -> None:
+        row = self._status.setdefault(request_id, {"final_answer": None})
+        row["status"] = status
+        if final_answer is not None:
+            row["final_answer"] = final_answer
+        row["updated"] = time.time()
+
+    async def get_status(self, request_id: str) -> Optional[Dict[str, Any]]:
+        row = self._status.get(request_id)
+        return dict(row) if row else None
+
+    async def append_event(self, request_id: str, event: Dict[str, Any]) -> int:
+        events = self._events.setdefault(request_id, [])
+        events.append(event)
+        self._touch(request_id)
+        return len(events)
+
+    async def get_events(self, request_id: str, after: int = 0) -> List[Tuple[int, Dict[str, Any]]]:
+        events = self._events.get(request_id, [])
+        return [(seq, event) for seq, event in enumerate(events[after:], start=after + 1)]
+
+    async def save_snapshot(self, request_id: str, snapshot: Dict[str, Any]) -> None:
+        self._snapshots[request_id] = snapshot
+        self._touch(request_id)
+
+    async def get_snapshot(self, request_id: str) -> Optional[Dict[str, Any]]:
+        return self._snapshots.get(request_id)
+
+    async def delete_task(self, request_id: str) -> None:
+        self._drop(request_id)
+
+    async def request_cancel(self, request_id: str) -> bool:
+        row = self._status.get(request_id)
+        if not row or row["status"] != "running":
+            return False
+        row["status"] = "cancelling"
+        row["updated"] = time.time()
+        return True
+
+    async def update_subscribers(self, request_id: str, delta: int) -> int:
+        count = max(self._subscribers.get(request_id, 0) + delta, 0)
+        self._subscribers[request_id] = count
+        return count
+
+
+class SqliteStateBackend(StateBackend):
+    """SQLite in WAL mode, shared by all workers on a host through one database file.
+
+    Calls run in a thread so the event loop never waits on disk or on the
+    database lock held by another worker.
+    """
+
+    def __init__(self, path: str, ttl: int = 3600, lease: float = 30.0):
+        self.ttl = ttl
+        self.lease = lease
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                request_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                final_answer TEXT,
+                snapshot TEXT,
+                subscribers INTEGER NOT NULL DEFAULT 0,
+                updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS events (
+                request_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                PRIMARY KEY (request_id, seq)
+            );
+            CREATE INDEX IF NOT EXISTS tasks_updated ON tasks (updated);
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(tasks)")}
+        if "subscribers" not in columns:
+            self._conn.execute("ALTER TABLE tasks ADD COLUMN subscribers INTEGER NOT NULL DEFAULT 0")
+
+    async def _run(self, sql: str, params: tuple = (), fetch: str = "") -> Any:
+        def run() -> Any:
+            with self._lock:
+                cursor = self._conn.execute(sql, params)
+                if fetch == "one":
+                    return cursor.fetchone()
+                if fetch == "all":
+                    return cursor.fetchall()
+                return cursor.lastrowid
+        return await asyncio.to_thread(run)
+
+    async def create_task(self, request_id: str, status: str = "running") -> None:
+        def run() -> None:
+            now = time.time()
+            cutoff = now - self.ttl
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    # Tasks of dead owners count as finished from here, so the TTL applies.
+                    self._conn.execute(
+                        "UPDATE tasks SET status = 'error', final_answer = ?, updated = ? "
+                        "WHERE status IN (?, ?) AND updated < ?",
+                        (json.dumps(LEASE_EXPIRED), now, *ACTIVE_STATUSES, now - self.lease)
+                    )
+                    expired = "SELECT request_id FROM tasks WHERE updated < ? AND status NOT IN (?, ?)"
+                    self._conn.execute(
+                        f"DELETE FROM events WHERE request_id IN ({expired})", (cutoff, *ACTIVE_STATUSES)
+                    )
+                    self._conn.execute(
+                        f"DELETE FROM tasks WHERE request_id IN ({expired})", (cutoff, *ACTIVE_STATUSES)
+                    )
+                    self._conn.execute(
+                        "INSERT INTO tasks (request_id, status, updated) VALUES (?, ?, ?)",
+                        (request_id, status, time.time())
+                    )
+                    self._conn.execute("DELETE FROM events WHERE request_id = ?", (request_id,))
+                    self._conn.execute("COMMIT")
+                except sqlite3.IntegrityError:
+                    self._conn.execute("ROLLBACK")
+                    raise TaskExistsError(f"Task {request_id} already exists")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        await asyncio.to_thread(run)
+
+    async def set_status(self, request_id: str, status: str, final_answer: Optional[Any] = None) -> None:
+        if final_answer is None:
+            await self._run(
+                "UPDATE tasks SET status = ?, updated = ? WHERE request_id = ?",
+                (status, time.time(), request_id)
+            )
+        else:
+            await self._run(
+                "UPDATE tasks SET status = ?, final_answer = ?, updated = ? WHERE request_id = ?",
+                (status, json.dumps(final_answer), time.time(), request_id)
+            )
+
+    async def get_status(self, request_id: str) -> Optional[Dict[str, Any]]:
+        row = await self._run(
+            "SELECT status, final_answer, updated FROM tasks WHERE request_id = ?", (request_id,), fetch="one"
+        )
+        if row is None:
+            return None
+        if row[0] in ACTIVE_STATUSES and row[2] < time.time() - self.lease:
+            row = await self._expire(request_id) or row
+        return {"status": row[0], "final_answer": json.loads(row[1]) if row[1] else None, "updated": row[2]}
+
+    async def append_event(self, request_id: str, event: Dict[str, Any]) -> int:
+        payload = json.dumps(event)
+
+        def run() -> int:
+            with self._lock:
+                cursor = self._conn.execute(
+                    "INSERT INTO events (request_id, seq, payload) "
+                    "SELECT ?, COALESCE(MAX(seq), 0) + 1, ? FROM events WHERE request_id = ? RETURNING seq",
+                    (request_id, payload, request_id)
+                )
+                return cursor.fetchone()[0]
+        return await asyncio.to_thread(run)
+
+    async def get_events(self, request_id: str, after: int = 0) -> List[Tuple[int, Dict[str, Any]]]:
+        rows = await self._run(
+            "SELECT seq, payload FROM events WHERE request_id = ? AND seq > ? ORDER BY seq",
+            (request_id, after), fetch="all"
+        )
+        return [(seq, json.loads(payload)) for seq, payload in rows]
+
+    async def save_snapshot(self, request_id: str, snapshot: Dict[str, Any]) -> None:
+        await self._run(
+            "UPDATE tasks SET snapshot = ?, updated = ? WHERE request_id = ?",
+            (json.dumps(snapshot), time.time(), request_id)
+        )
+
+    async def get_snapshot(self, request_id: str) -> Optional[Dict[str, Any]]:
+        row = await self._run("SELECT snapshot FROM tasks WHERE request_id = ?", (request_id,), fetch="one")
+        return json.loads(row[0]) if row and row[0] else None
+
+    async def delete_task(self, request_id: str) -> None:
+        await self._run("DELETE FROM events WHERE request_id = ?", (request_id,))
+        await self._run("DELETE FROM tasks WHERE request_id = ?", (request_id,))
+
+    async def _expire(self, request_id: str) -> Optional[Tuple[Any, ...]]:
+        # Conditional, so a heartbeat that lands first keeps the task alive.
+        now = time.time()
+        rows = await self._run(
+            "UPDATE tasks SET status = 'error', final_answer = ?, updated = ? "
+            "WHERE request_id = ? AND status IN (?, ?) AND updated < ? RETURNING status, final_answer, updated",
+            (json.dumps(LEASE_EXPIRED), now, request_id, *ACTIVE_STATUSES, now - self.lease), fetch="all"
+        )
+        return rows[0] if rows else None
+
+    async def request_cancel(self, request_id: str) -> bool:
+        # A task whose lease has expired has no owner left to cancel it.
+        now = time.time()
+        row = await self._run(
+            "UPDATE tasks SET status = 'cancelling', updated = ? "
+            "WHERE request_id = ? AND status = 'running' AND updated >= ? RETURNING request_id",
+            (now, request_id, now - self.lease), fetch="all"
+        )
+        return bool(row)
+
+    async def heartbeat(self, request_ids: List[str]) -> None:
+        if not request_ids:
+            return
+        placeholders = ", ".join("?" * len(request_ids))
+        await self._run(
+            f"UPDATE tasks SET updated = ? WHERE request_id IN ({placeholders}) AND status IN (?, ?)",
+            (time.time(), *request_ids, *ACTIVE_STATUSES)
+        )
+
+    async def update_subscribers(self, request_id: str, delta: int) -> int:
+        row = await self._run(
+            "UPDATE tasks SET subscribers = MAX(subscribers + ?, 0) WHERE request_id = ? RETURNING subscribers",
+            (delta, request_id), fetch="all"
+        )
+        return row[0][0] if row else 0
+
+    async def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def tracker_snapshot(token_tracker: TokenTracker, action_tracker: ActionTracker,
+                     planner: Optional[BudgetPlanner] = None) -> Dict[str, Any]:
+    state = action_tracker.get_state()
+    snapshot = {
+        "tokenUsage": token_tracker.get_total_usage(),
+        "tokenBreakdown": token_tracker.get_usage_breakdown(),
+        "budget": token_tracker.budget,
+        "actionState": {**state, "this_step": state["this_step"].model_dump(mode="json")}
+    }
+    if planner is not None:
+        snapshot["plan"] = planner.summary()
+    return snapshot
+
+
+def create_state_backend() -> StateBackend:
+    if settings.STATE_BACKEND == "memory":
+        return InMemoryStateBackend(ttl=settings.STATE_TASK_TTL)
+    if settings.STATE_BACKEND == "sqlite":
+        return SqliteStateBackend(settings.STATE_DB_PATH, ttl=settings.STATE_TASK_TTL, lease=settings.STATE_TASK_LEASE)
+    raise ValueError(f"Unknown state backend: {settings.STATE_BACKEND}")
+
+
+state_backend = lazy(create_state_backend)
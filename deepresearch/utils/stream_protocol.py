@@ -0,0 +1,107 @@
+import zlib
+from typing import Any, Dict, List, Optional
+
+from starlette.types import Message, Receive, Scope, Send
+from sse_starlette.sse import EventSourceResponse
+
+# Stream protocol versions understood by /api/v1/stream. Version 1 sends every
+# event in full; version 2 sends one snapshot and then patches of the progress state.
+PROTOCOL_FULL = 1
+PROTOCOL_DELTA = 2
+
+
+def _escape(key: str) -> str:
+    return key.replace("~", "~0").replace("/", "~1")
+
+
+def json_diff(old: Any, new: Any, path: str = "") -> List[Dict[str, Any]]:
+    """JSON-patch (RFC 6902) operations that turn `old` into `new`.
+
+    Uses add/remove/replace plus one extension: {"op": "append"} adds `value` to
+    the end of the string at `path`. Answers and reasoning mostly grow at the
+    end, so this sends only the new text instead of the whole string again.
+    """
+    if old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops: List[Dict[str, Any]] = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in new.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in old:
+                ops.append({"op": "add", "path": child, "value": value})
+            else:
+                ops.extend(json_diff(old[key], value, child))
+        return ops
+    if isinstance(old, list) and isinstance(new, list) and len(new) >= len(old):
+        ops = []
+        for index, value in enumerate(old):
+            ops.extend(json_diff(value, new[index], f"{path}/{index}"))
+        ops.extend({"op": "add", "path": f"{path}/-", "value": value} for value in new[len(old):])
+        return ops
+    if isinstance(old, str) and isinstance(new, str) and len(old) > 64 and new.startswith(old):
+        return [{"op": "append", "path": path, "value": new[len(old):]}]
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+class DeltaEncoder:
+    """Turns successive progress states into one snapshot followed by patches."""
+
+    def __init__(self):
+        self.state: Optional[Any] = None
+        self.version = 0
+
+    def encode(self, state: Any) -> Optional[Dict[str, Any]]:
+        if self.state is None:
+            self.state = state
+            return {"event": "snapshot", "data": {"version": self.version, "state": state}}
+        ops = json_diff(self.state, state)
+        if not ops:
+            return None
+        self.state = state
+        self.version += 1
+        return {"event": "patch", "data": {"version": self.version, "ops": ops}}
+
+
+class CompressedEventSourceResponse(EventSourceResponse):
+    """EventSourceResponse whose body is gzip or deflate encoded for one connection.
+
+    Every SSE frame, including pings, is flushed with Z_SYNC_FLUSH so it reaches
+    the client right away, while the compressor keeps its dictionary across
+    frames. Repeated keys and URLs therefore cost almost nothing after the first
+    event.
+    """
+
+    def __init__(self, *args: Any, encoding: str = "gzip", **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.encoding = encoding
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        wbits = 31 if self.encoding == "gzip" else 15
+        compressor = zlib.compressobj(6, zlib.DEFLATED, wbits)
+
+        async def compressed_send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = [(k, v) for k, v in message.get("headers", []) if k.lower() != b"content-length"]
+                headers += [(b"content-encoding", self.encoding.encode()), (b"vary", b"Accept-Encoding")]
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                body = compressor.compress(message.get("body", b""))
+                if message.get("more_body", False):
+                    body += compressor.flush(zlib.Z_SYNC_FLUSH)
+                else:
+                    body += compressor.flush(zlib.Z_FINISH)
+                message = {**message, "body": body}
+            await send(message)
+
+        await super().__call__(scope, receive, compressed_send)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+    for encoding in ("gzip", "deflate"):
+        if encoding in accepted:
+            return encoding
+    return None
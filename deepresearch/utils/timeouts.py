@@ -0,0 +1,45 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from ..config import settings
+from .metrics import registry, Counter
+from .tracer import current_span
+
+STAGE_TIMEOUTS: Counter = registry.register(Counter(
+    "deepresearch_stage_timeouts", "Search, read and LLM stages cut off by their timeout.", ["stage"]
+))
+
+
+class StageTimeout(TimeoutError):
+    def __init__(self, stage: str, seconds: float):
+        super().__init__(f"{stage} timed out after {seconds:g}s")
+        self.stage = stage
+        self.seconds = seconds
+
+
+def stage_seconds(stage: str) -> float:
+    return {
+        "search": settings.SEARCH_TIMEOUT,
+        "read": settings.READ_TIMEOUT,
+        "llm": settings.LLM_TIMEOUT
+    }[stage]
+
+
+@asynccontextmanager
+async def stage_timeout(stage: str) -> AsyncIterator[None]:
+    """Bounds one search, read or LLM stage; 0 disables the limit.
+
+    Expiry cancels the awaited call, so the in-flight httpx/OpenAI request is
+    closed rather than left running, and raises StageTimeout.
+    """
+    seconds = stage_seconds(stage)
+    try:
+        async with asyncio.timeout(seconds or None):
+            yield
+    except TimeoutError as e:
+        if isinstance(e, StageTimeout):
+            raise
+        STAGE_TIMEOUTS.labels(stage).inc()
+        current_span().set(timeout=stage)
+        raise StageTimeout(stage, seconds) from e
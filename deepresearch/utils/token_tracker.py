@@ -1,27 +1,62 @@
 import logging
-from typing import Dict, List, Optional, Union
-from openai.types.chat import ChatCompletion
+from typing import TYPE_CHECKING, Dict, List, Optional, Union
 from ..types import TokenUsage
+from .metrics import TOOL_TOKENS
+from .tracer import current_span
+
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletion
 
 class TokenTracker:
     def __init__(self, budget: Optional[int] = None):
         self.usages: List[TokenUsage] = []
         self.budget = budget
+        self.reserved = 0
 
-    async def track_usage(self, tool: str, usage: Union[ChatCompletion, int]) -> None:
-        tokens = usage.usage.total_tokens if isinstance(usage, ChatCompletion) else int(usage)
-
-        current_total = self.get_total_usage()
-        if self.budget and current_total + tokens > self.budget:
-            logging.error(f"Token budget exceeded: {current_total + tokens} > {self.budget}")
-            return
+    async def track_usage(self, tool: str, usage: Union["ChatCompletion", int]) -> None:
+        tokens = int(usage) if isinstance(usage, int) else usage.usage.total_tokens
+        TOOL_TOKENS.labels(tool).inc(tokens)
+        current_span().add("tokens", tokens)
 
-        if not self.budget or current_total + tokens <= self.budget:
+        if self._fits(tokens):
             self.usages.append(TokenUsage(tool=tool, tokens=tokens))
 
+    def _fits(self, tokens: int) -> bool:
+        # Reserved tokens belong to side work (e.g. speculation), not to the caller.
+        total = self.get_total_usage() + self.reserved + tokens
+        if self.budget and total > self.budget:
+            logging.error(f"Token budget exceeded: {total} > {self.budget} ({self.reserved} reserved)")
+            return False
+        return True
+
     def get_total_usage(self) -> int:
         return sum(usage.tokens for usage in self.usages)
 
+    def get_remaining(self) -> Optional[int]:
+        if not self.budget:
+            return None
+        return self.budget - self.get_total_usage() - self.reserved
+
+    def reserve(self, tokens: int) -> bool:
+        # Holds part of the budget for side work (e.g. speculation) so it can't be
+        # spent twice; callers must release() it when the work ends.
+        remaining = self.get_remaining()
+        if remaining is not None and remaining < tokens:
+            return False
+        self.reserved += tokens
+        return True
+
+    def release(self, tokens: int) -> None:
+        self.reserved = max(self.reserved - tokens, 0)
+
+    def merge(self, other: "TokenTracker") -> None:
+        # Usage was already counted in metrics by the other tracker. Callers release
+        # any reservation backing it first, since this spend came out of it. The
+        # tokens were really spent, so they are kept even past the budget.
+        for usage in other.usages:
+            self._fits(usage.tokens)
+            self.usages.append(usage)
+
     def get_usage_breakdown(self) -> Dict[str, int]:
         breakdown: Dict[str, int] = {}
         for usage in self.usages:
@@ -37,3 +72,4 @@ class TokenTracker:
 
     def reset(self) -> None:
         self.usages = []
+        self.reserved = 0
@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+import itertools
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from ..config import settings
+from .lazy import lazy
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "task_id", "attributes")
+
+    def __init__(self, name: str, span_id: int, parent_id: Optional[int], task_id: int,
+                 attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.task_id = task_id
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def add(self, key: str, amount: int) -> None:
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+
+class _NoopSpan:
+    # Returned when no trace is active so call sites never need to check.
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def add(self, key: str, amount: int) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    def __init__(self, request_id: str, max_spans: int):
+        self.request_id = request_id
+        self.trace_id = hashlib.md5(request_id.encode()).hexdigest()
+        self.max_spans = max_spans
+        self.spans: List[Span] = []
+        self.dropped_spans = 0
+        # Spans use the monotonic clock; this pair anchors them to wall time.
+        self.wall_anchor_ns = time.time_ns()
+        self.perf_anchor_ns = time.perf_counter_ns()
+        self._ids = itertools.count(1)
+        self._task_ids: Dict[int, int] = {}
+
+    def _task_id(self) -> int:
+        try:
+            key = id(asyncio.current_task())
+        except RuntimeError:
+            key = 0
+        return self._task_ids.setdefault(key, len(self._task_ids) + 1)
+
+    def new_span(self, name: str, parent: Optional[Span], attributes: Dict[str, Any]) -> Optional[Span]:
+        if len(self.spans) >= self.max_spans:
+            self.dropped_spans += 1
+            return None
+        span = Span(name, next(self._ids), parent.span_id if parent else None, self._task_id(), attributes)
+        self.spans.append(span)
+        return span
+
+    def to_wall_ns(self, perf_ns: int) -> int:
+        return self.wall_anchor_ns + (perf_ns - self.perf_anchor_ns)
+
+    def to_dict(self) -> Dict[str, Any]:
+        now = time.perf_counter_ns()
+        return {
+            "requestId": self.request_id,
+            "traceId": self.trace_id,
+            "droppedSpans": self.dropped_spans,
+            "spans": [
+                {
+                    "id": span.span_id,
+                    "parentId": span.parent_id,
+                    "name": span.name,
+                    "start": self.to_wall_ns(span.start_ns) / 1e9,
+                    "end": self.to_wall_ns(span.end_ns) / 1e9 if span.end_ns else None,
+                    "durationMs": ((span.end_ns or now) - span.start_ns) / 1e6,
+                    "attributes": span.attributes,
+                }
+                for span in self.spans
+            ],
+        }
+
+    def to_chrome(self) -> Dict[str, Any]:
+        now = time.perf_counter_ns()
+        events = []
+        for span in self.spans:
+            end_ns = span.end_ns or now
+            events.append({
+                "name": span.name,
+                "cat": span.name.split(":", 1)[0],
+                "ph": "X",
+                "ts": (span.start_ns - self.perf_anchor_ns) / 1e3,
+                "dur": (end_ns - span.start_ns) / 1e3,
+                "pid": 1,
+                "tid": span.task_id,
+                "args": span.attributes,
+            })
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"requestId": self.request_id, "droppedSpans": self.dropped_spans},
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        now = time.perf_counter_ns()
+        spans = []
+        for span in self.spans:
+            otlp_span = {
+                "traceId": self.trace_id,
+                "spanId": f"{span.span_id:016x}",
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(self.to_wall_ns(span.start_ns)),
+                "endTimeUnixNano": str(self.to_wall_ns(span.end_ns or now)),
+                "attributes": [_otlp_attribute(key, value) for key, value in span.attributes.items()],
+            }
+            if span.parent_id:
+                otlp_span["parentSpanId"] = f"{span.parent_id:016x}"
+            spans.append(otlp_span)
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", "deepresearch")]},
+                "scopeSpans": [{"scope": {"name": "deepresearch"}, "spans": spans}],
+            }]
+        }
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    def __init__(self, max_traces: int = 256, max_spans: int = 2000):
+        self.max_traces = max_traces
+        self.max_spans = max_spans
+        self._traces: "OrderedDict[str, Trace]" = OrderedDict()
+
+    def start_trace(self, request_id: str) -> Trace:
+        trace = self._traces.get(request_id)
+        if trace is None:
+            trace = Trace(request_id, self.max_spans)
+            self._traces[request_id] = trace
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+        _current_trace.set(trace)
+        _current_span.set(None)
+        return trace
+
+    def get_trace(self, request_id: str) -> Optional[Trace]:
+        return self._traces.get(request_id)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Any]:
+        trace = _current_trace.get()
+        span = trace.new_span(name, _current_span.get(), attributes) if trace else None
+        if span is None:
+            yield NOOP_SPAN
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            span.end_ns = time.perf_counter_ns()
+            _current_span.reset(token)
+
+
+def current_span() -> Any:
+    return _current_span.get() or NOOP_SPAN
+
+
+tracer = lazy(lambda: Tracer(settings.TRACE_MAX_TASKS, settings.TRACE_MAX_SPANS))
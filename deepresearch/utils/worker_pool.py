@@ -0,0 +1,97 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Optional
+
+from .metrics import QUEUE_DEPTH
+
+# Bodies smaller than this are cheaper to pickle than to stage in shared memory.
+SHARED_MEMORY_THRESHOLD = 64 * 1024
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no track flag; the parent owns unlinking either way.
+        return shared_memory.SharedMemory(name=name)
+
+
+def _run_shared(fn: Callable[..., Any], name: str, size: int, args: tuple) -> Any:
+    shm = _attach(name)
+    try:
+        text = str(shm.buf[:size], "utf-8")
+    finally:
+        shm.close()
+    return fn(text, *args)
+
+
+class WorkerPool:
+    """Runs CPU-bound text functions off the event loop.
+
+    mode is "process", "thread" or "sync". In process mode large bodies are written
+    once into shared memory and workers decode them in place instead of receiving a
+    pickled copy. At most `max_pending` jobs are admitted at a time; further callers
+    wait, which pushes back on the stages that produce pages.
+    """
+
+    def __init__(self, name: str, mode: str = "process", workers: int = 0, max_pending: int = 0):
+        if mode not in ("process", "thread", "sync"):
+            raise ValueError(f"Unknown worker pool mode: {mode}")
+        self.name = name
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 4
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._depth = QUEUE_DEPTH.labels(name)
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+        return self._executor
+
+    @property
+    def saturated(self) -> bool:
+        return self._slots is not None and self._slots.locked()
+
+    async def run(self, fn: Callable[..., Any], text: str, *args: Any) -> Any:
+        """Calls fn(text, *args) in the pool. fn must be a picklable module-level function."""
+        if self.mode == "sync":
+            return fn(text, *args)
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        self._depth.inc()
+        try:
+            await self._slots.acquire()
+        finally:
+            self._depth.dec()
+        try:
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            if self.mode == "thread":
+                return await loop.run_in_executor(executor, fn, text, *args)
+
+            data = text.encode("utf-8")
+            if len(data) < SHARED_MEMORY_THRESHOLD:
+                return await loop.run_in_executor(executor, fn, text, *args)
+
+            shm = shared_memory.SharedMemory(create=True, size=len(data))
+            try:
+                shm.buf[:len(data)] = data
+                return await loop.run_in_executor(executor, _run_shared, fn, shm.name, len(data), args)
+            finally:
+                shm.close()
+                shm.unlink()
+        finally:
+            self._slots.release()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,7 @@
+import os
+
+# Settings are read lazily, but anything that touches them needs the required keys.
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("JINA_API_KEY", "test")
+# Content work runs inline so tests never start worker processes.
+os.environ.setdefault("CONTENT_POOL_MODE", "sync")
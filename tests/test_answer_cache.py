@@ -0,0 +1,50 @@
+import pytest
+
+from deepresearch.utils.answer_cache import AnswerCache, normalize_question
+
+
+@pytest.fixture
+def cache():
+    return AnswerCache()
+
+
+def test_exact_and_reworded_questions_hit(cache):
+    cache.put("What is the capital of France?", "Paris")
+    assert cache.get("what is the capital of france").answer == "Paris"
+    assert cache.get("Please, what is the capital of France?").answer == "Paris"
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("What is the capital of France?", "What is the capital of Germany?"),
+    ("How many people live in the capital city of France according to the official census?",
+     "How many people live in the capital city of Germany according to the official census?"),
+    ("Is it safe to take ibuprofen during pregnancy in the third trimester?",
+     "Is it safe to take acetaminophen during pregnancy in the third trimester?"),
+    ("Who won the FIFA World Cup in 2018 and who was the top scorer of the tournament?",
+     "Who won the FIFA World Cup in 2022 and who was the top scorer of the tournament?"),
+    ("Is it safe to drink tap water in Lisbon during the summer months for tourists?",
+     "Is it not safe to drink tap water in Lisbon during the summer months for tourists?"),
+    ("Who is the current chief executive officer of the largest electric car maker?",
+     "Who was the current chief executive officer of the largest electric car maker?"),
+    ("What is 2+2?", "What is 2*2?"),
+    ("Is Java faster than Python?", "Is Python faster than Java?"),
+    ("Did Brazil beat Germany in the 2014 World Cup?", "Did Germany beat Brazil in the 2014 World Cup?"),
+    ("How do I convert Fahrenheit to Celsius?", "How do I convert Celsius to Fahrenheit?"),
+])
+def test_changed_content_word_misses(cache, cached, asked):
+    cache.put(cached, "cached answer")
+    assert cache.get(asked) is None
+
+
+def test_normalize_keeps_operators():
+    assert normalize_question("What is 2+2?") == "what is 2 + 2"
+
+
+def test_lru_eviction():
+    cache = AnswerCache(max_size=2)
+    cache.put("first question about rivers", "a")
+    cache.put("second question about mountains", "b")
+    cache.get("first question about rivers")
+    cache.put("third question about deserts", "c")
+    assert cache.get("second question about mountains") is None
+    assert cache.get("first question about rivers").answer == "a"
@@ -0,0 +1,86 @@
+import httpx
+import pytest
+
+from deepresearch.utils.cassette import CassetteMissError, CassetteTransport
+
+
+def upstream():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json={"code": 200, "call": len(calls), "echo": request.url.params.get("q")})
+
+    return httpx.MockTransport(handler), calls
+
+
+async def record(path, requests):
+    inner, calls = upstream()
+    transport = CassetteTransport(str(path), "record", inner=inner)
+    async with httpx.AsyncClient(transport=transport) as client:
+        responses = [await send(client) for send in requests]
+    return responses, calls
+
+
+def post(body):
+    return lambda client: client.post("https://r.jina.ai/", json=body, headers={"Authorization": "Bearer secret"})
+
+
+@pytest.mark.asyncio
+async def test_record_then_replay_round_trip(tmp_path):
+    path = tmp_path / "session.jsonl.gz"
+    requests = [
+        lambda client: client.get("https://api.search.brave.com/res/v1/web/search", params={"q": "rust"}),
+        post({"url": "https://example.com", "mode": "text"}),
+    ]
+    recorded, calls = await record(path, requests)
+    assert len(calls) == 2
+
+    transport = CassetteTransport(str(path), "replay", latency_scale=0)
+    assert transport.interactions() == 2
+    async with httpx.AsyncClient(transport=transport) as client:
+        replayed = [await send(client) for send in requests]
+        # JSON bodies match regardless of key order.
+        reordered = await client.post("https://r.jina.ai/", json={"mode": "text", "url": "https://example.com"})
+    assert [(r.status_code, r.json()) for r in replayed] == [(r.status_code, r.json()) for r in recorded]
+    assert reordered.json() == recorded[1].json()
+
+
+@pytest.mark.asyncio
+async def test_repeated_requests_replay_in_order(tmp_path):
+    path = tmp_path / "session.jsonl.gz"
+    await record(path, [post({"url": "https://example.com"})] * 2)
+
+    transport = CassetteTransport(str(path), "replay", latency_scale=0)
+    async with httpx.AsyncClient(transport=transport) as client:
+        calls = [(await post({"url": "https://example.com"})(client)).json()["call"] for _ in range(3)]
+    # The last recording keeps serving once the queue is down to one.
+    assert calls == [1, 2, 2]
+
+
+@pytest.mark.asyncio
+async def test_auth_headers_are_not_recorded(tmp_path):
+    path = tmp_path / "session.jsonl.gz"
+    await record(path, [post({"url": "https://example.com"})])
+    entries = CassetteTransport.load(path)
+    assert "secret" not in repr(entries)
+    assert entries[0]["headers"] == {"content-type": "application/json"}
+
+
+@pytest.mark.asyncio
+async def test_unrecorded_request_raises_miss(tmp_path):
+    path = tmp_path / "session.jsonl.gz"
+    await record(path, [post({"url": "https://example.com"})])
+
+    transport = CassetteTransport(str(path), "replay", latency_scale=0)
+    async with httpx.AsyncClient(transport=transport) as client:
+        with pytest.raises(CassetteMissError):
+            await post({"url": "https://other.example.com"})(client)
+        # A miss is an httpx transport error, so tools handle it like a network failure.
+        with pytest.raises(httpx.TransportError):
+            await client.get("https://api.jina.ai/v1/search")
+
+
+def test_unknown_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        CassetteTransport(str(tmp_path / "x.jsonl.gz"), "rewind")
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from deepresearch.tools import diary, error_analyzer
+from deepresearch.tools.diary import RollingDiary, estimate_tokens, render_diary, truncate_to_tokens
+
+
+@pytest.mark.parametrize("text", ["abc " * 1000, "中文" * 1000, "mixed 中文 text " * 300])
+def test_truncation_stays_under_estimate(text):
+    assert estimate_tokens(truncate_to_tokens(text, 50)) <= 50
+
+
+def test_cjk_is_counted_per_character():
+    assert estimate_tokens("你好世界") == 4
+
+
+def test_render_stays_under_ceiling_with_omission_note():
+    entries = [f"步骤 {i}: 搜索了很多中文内容" * 5 for i in range(200)]
+    rendered = render_diary(entries, "摘要" * 2000, 100, 500)
+    assert "earlier steps omitted" in rendered
+    assert estimate_tokens(rendered) <= 500
+
+
+@pytest.mark.asyncio
+async def test_failed_compaction_falls_back_to_truncation(monkeypatch):
+    async def summarize(*args, **kwargs):
+        raise RuntimeError("model unavailable")
+
+    prompts = []
+
+    async def call_function(tool, prompt, function, response_model, tracker=None, label=None):
+        prompts.append(prompt)
+        return response_model(recap="", blame="", improvement=""), 0
+
+    monkeypatch.setattr(diary.DiaryCompactor, "summarize", summarize)
+    monkeypatch.setattr(error_analyzer.model_router, "call_function", call_function)
+    rolling = RollingDiary(recent_steps=2, digest_tokens=100)
+    rolling.extend([f"step {i}: searched for something long " * 20 for i in range(200)])
+
+    await error_analyzer.ErrorAnalyzer.analyze_steps(rolling)
+
+    schema = estimate_tokens(json.dumps(error_analyzer.ANALYZE_FUNCTION))
+    assert estimate_tokens(prompts[0]) + schema <= error_analyzer.settings.ERROR_ANALYZER_MAX_TOKENS
+    assert rolling.digested == 0
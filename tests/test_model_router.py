@@ -0,0 +1,65 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from deepresearch.types import DedupResponse
+from deepresearch.utils import model_router as router_module
+from deepresearch.utils.model_router import ModelRouter
+from deepresearch.utils.token_tracker import TokenTracker
+
+
+def completion(arguments: str, tokens: int):
+    message = SimpleNamespace(function_call=SimpleNamespace(arguments=arguments))
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=message)],
+        usage=SimpleNamespace(total_tokens=tokens, prompt_tokens=tokens, completion_tokens=0)
+    )
+
+
+class FakeClient:
+    """Answers each cascade stage with the next queued response."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.models = []
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, model, **kwargs):
+        self.models.append(model)
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def install(*responses):
+        fake = FakeClient(responses)
+        monkeypatch.setattr(router_module, "get_llm_client", lambda model: fake)
+        return fake
+    return install
+
+
+@pytest.mark.asyncio
+async def test_escalated_call_charges_every_stage(client):
+    fake = client(
+        completion(json.dumps({"think": "", "unique_queries": ["a"], "confidence": 0.1}), 100),
+        completion(json.dumps({"think": "", "unique_queries": ["a"], "confidence": 0.9}), 300),
+    )
+    tracker = TokenTracker()
+    result, tokens = await ModelRouter().call_function("dedup", "prompt", {"name": "f"}, DedupResponse, tracker)
+    assert result.unique_queries == ["a"]
+    assert tokens == 400
+    assert fake.models == ["gpt-4o-mini", "gpt-4o"]
+    assert tracker.get_usage_breakdown() == {"dedup": 400}
+
+
+@pytest.mark.asyncio
+async def test_failed_last_stage_still_charges_earlier_stages(client):
+    client(
+        completion(json.dumps({"think": "", "unique_queries": ["a"], "confidence": 0.1}), 100),
+        completion("not json", 300),
+    )
+    tracker = TokenTracker()
+    with pytest.raises(ValueError):
+        await ModelRouter().call_function("dedup", "other prompt", {"name": "f"}, DedupResponse, tracker)
+    assert tracker.get_usage_breakdown() == {"dedup": 400}
@@ -0,0 +1,41 @@
+import httpx
+import pytest
+
+from deepresearch.config import settings
+from deepresearch.tools import read
+from deepresearch.tools.read import Reader
+from deepresearch.types import ReadOptions
+
+PAGE = "数据" * 500
+
+
+def jina(request: httpx.Request) -> httpx.Response:
+    url = request.read().decode()
+    content = "" if "empty" in url else PAGE
+    if request.headers["accept"] == "text/plain":
+        return httpx.Response(200, text=f"Title: Page\nURL Source: {url}\n\nMarkdown Content:\n{content}")
+    return httpx.Response(200, json={"code": 200, "status": 200, "data": {
+        "title": "Page", "description": "", "url": url, "content": content, "usage": {"tokens": 2000}
+    }})
+
+
+@pytest.fixture(params=[True, False], ids=["stream", "buffered"])
+def reader(request, monkeypatch):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(jina))
+    monkeypatch.setattr(read, "get_http_client", lambda: client)
+    monkeypatch.setattr(settings, "READ_STREAM", request.param)
+    return request.param
+
+
+@pytest.mark.asyncio
+async def test_cap_counts_utf8_bytes(reader):
+    response, _ = await Reader.read_url(f"https://example.com/cap-{reader}", options=ReadOptions(max_bytes=301))
+    assert response.truncated
+    assert len(response.data.content.encode()) <= 301
+    assert PAGE.startswith(response.data.content)
+
+
+@pytest.mark.asyncio
+async def test_empty_page_is_an_error(reader):
+    with pytest.raises(ValueError, match="Invalid response data"):
+        await Reader.read_url(f"https://example.com/empty-{reader}")
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from deepresearch.utils.singleflight import SingleFlight
+
+
+class Upstream:
+    """Counts calls and blocks until released, like a slow upstream request."""
+
+    def __init__(self):
+        self.calls = 0
+        self.cancelled = False
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return "result"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_request():
+    flight, upstream = SingleFlight(), Upstream()
+    waiters = [asyncio.create_task(flight.do(("read", "url"), upstream)) for _ in range(3)]
+    await asyncio.sleep(0)
+    upstream.release.set()
+    assert await asyncio.gather(*waiters) == ["result"] * 3
+    assert upstream.calls == 1
+    assert flight.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelling_one_waiter_keeps_shared_call_running():
+    flight, upstream = SingleFlight(), Upstream()
+    first = asyncio.create_task(flight.do(("read", "url"), upstream))
+    second = asyncio.create_task(flight.do(("read", "url"), upstream))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert not upstream.cancelled
+    assert flight.in_flight() == 1
+
+    upstream.release.set()
+    assert await second == "result"
+    assert upstream.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_last_waiter_leaving_cancels_shared_call():
+    flight, upstream = SingleFlight(), Upstream()
+    waiters = [asyncio.create_task(flight.do(("read", "url"), upstream)) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert upstream.cancelled
+    assert flight.in_flight() == 0
+
+    # A new call after the cancelled one starts a fresh request.
+    retry = asyncio.create_task(flight.do(("read", "url"), upstream))
+    await asyncio.sleep(0)
+    upstream.release.set()
+    assert await retry == "result"
+    assert upstream.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_error_reaches_every_waiter():
+    flight = SingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0)
+        raise ValueError("upstream failed")
+
+    results = await asyncio.gather(
+        flight.do(("search", "q"), failing), flight.do(("search", "q"), failing), return_exceptions=True
+    )
+    assert [str(r) for r in results] == ["upstream failed"] * 2
+    assert flight.in_flight() == 0
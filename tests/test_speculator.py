@@ -0,0 +1,49 @@
+import pytest
+
+from deepresearch.utils.speculator import Speculator
+from deepresearch.utils.token_tracker import TokenTracker
+
+
+def search_costing(tokens: int):
+    calls = []
+
+    async def search(query, tracker):
+        calls.append(query)
+        await tracker.track_usage("search", tokens)
+        return None, tokens
+
+    search.calls = calls
+    return search
+
+
+@pytest.mark.asyncio
+async def test_overrun_of_each_share_is_still_charged():
+    parent = TokenTracker(200_000)
+    speculator = Speculator(search_costing(15_000), parent, 20_000)
+    assert speculator.start(["gap one", "gap two"])
+    assert speculator.share == 10_000
+    assert parent.reserved == 20_000
+
+    results = await speculator.commit()
+
+    assert [result.gap for result in results] == ["gap one", "gap two"]
+    assert parent.get_total_usage() == 30_000
+    assert parent.reserved == 0
+
+
+@pytest.mark.asyncio
+async def test_spend_past_the_parent_budget_is_kept():
+    parent = TokenTracker(80_000)
+    speculator = Speculator(search_costing(15_000), parent, 20_000)
+    assert speculator.start(["gap one", "gap two"])
+    await parent.track_usage("agent", 60_000)
+    await speculator.commit()
+    assert parent.get_total_usage() == 90_000
+
+
+@pytest.mark.asyncio
+async def test_gaps_without_a_share_do_not_start():
+    parent = TokenTracker(4)
+    speculator = Speculator(search_costing(1), parent, 20_000)
+    assert not speculator.start(["gap one", "gap two"])
+    assert parent.reserved == 0
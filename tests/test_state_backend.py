@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+
+from deepresearch.utils.state_backend import (
+    LEASE_EXPIRED, InMemoryStateBackend, SqliteStateBackend, TaskExistsError
+)
+
+
+@pytest_asyncio.fixture(params=["memory", "sqlite"])
+async def backend(request, tmp_path):
+    if request.param == "memory":
+        backend = InMemoryStateBackend(ttl=0)
+    else:
+        backend = SqliteStateBackend(str(tmp_path / "state.db"), ttl=0, lease=60)
+    yield backend
+    await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_duplicate_task_is_refused(backend):
+    await backend.create_task("a")
+    await backend.append_event("a", {"n": 1})
+    with pytest.raises(TaskExistsError):
+        await backend.create_task("a")
+    assert await backend.get_events("a") == [(1, {"n": 1})]
+
+
+@pytest.mark.asyncio
+async def test_purge_keeps_running_tasks(backend):
+    await backend.create_task("running")
+    await backend.create_task("done")
+    await backend.set_status("done", "completed", "answer")
+    await asyncio.sleep(0.01)
+    await backend.create_task("new")
+    assert (await backend.get_status("running"))["status"] == "running"
+    assert await backend.get_status("done") is None
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_marks_task_error(tmp_path):
+    backend = SqliteStateBackend(str(tmp_path / "state.db"), lease=0.2)
+    await backend.create_task("alive")
+    await backend.create_task("dead")
+    for _ in range(3):
+        await asyncio.sleep(0.1)
+        await backend.heartbeat(["alive"])
+
+    assert (await backend.get_status("alive"))["status"] == "running"
+    status = await backend.get_status("dead")
+    assert (status["status"], status["final_answer"]) == ("error", LEASE_EXPIRED)
+    assert not await backend.request_cancel("dead")
+    assert await backend.request_cancel("alive")
+    await backend.close()
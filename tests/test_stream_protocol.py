@@ -0,0 +1,147 @@
+import asyncio
+import copy
+import zlib
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Route
+
+from deepresearch.utils.stream_protocol import (
+    CompressedEventSourceResponse, DeltaEncoder, json_diff, negotiate_encoding
+)
+
+
+def _unescape(token):
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def apply_patch(state, ops):
+    """Reference client: applies json_diff operations, including the append extension."""
+    state = copy.deepcopy(state)
+    for op in ops:
+        if op["path"] == "":
+            state = state + op["value"] if op["op"] == "append" else op["value"]
+            continue
+        *parents, last = [_unescape(token) for token in op["path"].split("/")[1:]]
+        target = state
+        for token in parents:
+            target = target[int(token)] if isinstance(target, list) else target[token]
+        if isinstance(target, list):
+            if op["op"] == "add" and last == "-":
+                target.append(op["value"])
+                continue
+            last = int(last)
+        if op["op"] in ("add", "replace"):
+            target[last] = op["value"]
+        elif op["op"] == "remove":
+            del target[last]
+        elif op["op"] == "append":
+            target[last] += op["value"]
+        else:
+            raise AssertionError(f"unknown op {op}")
+    return state
+
+
+LONG = "The answer starts with a long paragraph that keeps growing as the model writes. " * 2
+
+STATES = [
+    {"tokenUsage": 0, "actionState": None},
+    {"tokenUsage": 120, "actionState": {"this_step": {"action": "search", "searchQuery": "q1"}, "gaps": ["q1"]}},
+    {"tokenUsage": 480, "actionState": {"this_step": {"action": "answer", "answer": LONG}, "gaps": ["q1", "q2"]}},
+    {"tokenUsage": 900, "actionState": {"this_step": {"action": "answer", "answer": LONG + "More text."},
+                                        "gaps": ["q1", "q2", "q3"]}},
+    {"tokenUsage": 950, "actionState": {"this_step": {"action": "reflect", "questionsToAnswer": ["a/b", "c~d"]},
+                                        "gaps": ["q3"]}},
+    {"tokenUsage": 950, "actionState": None, "a/b": {"c~d": [1, 2, {"x": None}]}},
+    {"tokenUsage": 1000, "a/b": {"c~d": [1, {"x": True}]}, "done": True},
+]
+
+
+@pytest.mark.parametrize("old, new", list(zip(STATES, STATES[1:])) + [
+    ([1, 2], [1, 2, 3, 4]),
+    ("short", "shorter"),
+    (LONG, LONG + "tail"),
+    ({"a": 1}, ["not", "a", "dict"]),
+])
+def test_json_diff_round_trip(old, new):
+    assert apply_patch(old, json_diff(old, new)) == new
+
+
+def test_long_string_growth_is_sent_as_append():
+    ops = json_diff({"answer": LONG}, {"answer": LONG + "tail"})
+    assert ops == [{"op": "append", "path": "/answer", "value": "tail"}]
+
+
+def test_delta_encoder_reproduces_every_state():
+    encoder = DeltaEncoder()
+    client_state, version = None, None
+    for state in STATES + [STATES[-1]]:
+        message = encoder.encode(copy.deepcopy(state))
+        if message is None:
+            # Unchanged state sends nothing.
+            assert client_state == state
+            continue
+        data = message["data"]
+        if message["event"] == "snapshot":
+            client_state = data["state"]
+        else:
+            assert data["version"] == version + 1
+            client_state = apply_patch(client_state, data["ops"])
+        version = data["version"]
+        assert client_state == state
+    assert version == len(STATES) - 1
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding("br, gzip;q=0.8") == "gzip"
+    assert negotiate_encoding("deflate") == "deflate"
+    assert negotiate_encoding("br") is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("encoding, wbits", [("gzip", 31), ("deflate", 15)])
+async def test_compressed_event_stream_decodes(encoding, wbits):
+    async def events():
+        for index in range(3):
+            yield {"event": "patch", "data": f'{{"version": {index}}}'}
+
+    async def endpoint(request):
+        return CompressedEventSourceResponse(events(), encoding=encoding)
+
+    app = Starlette(routes=[Route("/stream", endpoint)])
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        async with client.stream("GET", "/stream") as response:
+            assert response.headers["content-encoding"] == encoding
+            raw = b"".join([chunk async for chunk in response.aiter_raw()])
+    body = zlib.decompressobj(wbits).decompress(raw).decode()
+    assert [line for line in body.splitlines() if line.startswith("data:")] == [
+        f'data: {{"version": {index}}}' for index in range(3)
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("protocol, events", [
+    (1, ["connected", "message", "message"]),
+    (2, ["connected", "snapshot", "patch", "final"]),
+])
+async def test_stream_endpoint_releases_its_subscription(protocol, events):
+    from deepresearch import main
+    from deepresearch.utils.state_backend import state_backend
+
+    request_id = f"stream-test-{protocol}"
+    await state_backend.create_task(request_id)
+    await state_backend.append_event(request_id, {"data": {"type": "step", "content": "searching"}})
+    await state_backend.set_status(request_id, "completed", {"answer": "done"})
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async with client.stream("GET", f"/api/v1/stream/{request_id}", params={"protocol": protocol}) as response:
+            body = (await response.aread()).decode()
+    blocks = [block.splitlines() for block in body.replace("\r\n", "\n").split("\n\n") if "data:" in block]
+    names = [next((line[len("event: "):] for line in block if line.startswith("event:")), "message") for block in blocks]
+    assert names == events
+
+    await asyncio.gather(*main.background)
+    assert await state_backend.update_subscribers(request_id, 0) == 0
+    await state_backend.delete_task(request_id)